@@ -1,44 +1,50 @@
 # agents/agente_conhecimento.py
 
-import re
+from agents.message_normalizer import normalize, fold
+
+# Base de conhecimento simples (você pode expandir conforme desejar)
+KNOWLEDGE = {
+    "capital da frança": "Paris",
+    "capital do brasil": "Brasília",
+    "quem descobriu o brasil": "Pedro Álvares Cabral",
+    "o que é api": (
+        "API significa Application Programming Interface. "
+        "É um conjunto de rotinas e padrões de programação que permitem "
+        "a comunicação entre diferentes sistemas de software."
+    ),
+    "qual a moeda dos estados unidos": "Dólar americano (USD)",
+    "quem foi albert einstein": (
+        "Albert Einstein foi um físico teórico nascido na Alemanha, "
+        "conhecido pela teoria da relatividade."
+    ),
+}
+
+# Índice pelas chaves normalizadas (sem acento), no mesmo formato de NormalizedMessage.clean
+KNOWLEDGE_INDEX = {fold(k): v for k, v in KNOWLEDGE.items()}
+
 
 class AgenteConhecimento:
     """
     Responde perguntas gerais mapeadas em um pequeno banco de dados interno.
     """
     def __init__(self):
-        # Base de conhecimento simples (você pode expandir conforme desejar)
-        self.knowledge = {
-            "capital da frança": "Paris",
-            "capital do brasil": "Brasília",
-            "quem descobriu o brasil": "Pedro Álvares Cabral",
-            "o que é api": (
-                "API significa Application Programming Interface. "
-                "É um conjunto de rotinas e padrões de programação que permitem "
-                "a comunicação entre diferentes sistemas de software."
-            ),
-            "qual a moeda dos estados unidos": "Dólar americano (USD)",
-            "quem foi albert einstein": (
-                "Albert Einstein foi um físico teórico nascido na Alemanha, "
-                "conhecido pela teoria da relatividade."
-            ),
-        }
-
-    def responder(self, texto: str) -> str | None:
+        self.knowledge = KNOWLEDGE
+        self._index    = KNOWLEDGE_INDEX
+
+    def responder(self, texto) -> str | None:
         """
         Tenta encontrar a pergunta no banco interno. Se não encontrar,
-        retorna None para cair no fallback.
+        retorna None para cair no fallback. `texto` pode ser str ou
+        NormalizedMessage.
         """
-        t = texto.lower().strip().rstrip("?")
-        # Normaliza espaços
-        t = re.sub(r"\s+", " ", t)
+        t = normalize(texto).clean
 
         # Verifica correspondência exata
-        if t in self.knowledge:
-            return self.knowledge[t]
+        if t in self._index:
+            return self._index[t]
 
         # Você pode incluir buscas parciais:
-        for key, answer in self.knowledge.items():
+        for key, answer in self._index.items():
             if key in t:
                 return answer
 
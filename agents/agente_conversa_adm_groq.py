@@ -1,21 +1,76 @@
 # agents/agente_conversa_adm_groq.py
 
 import os
+import time
+import logging
 import requests
 
+from clients.deadline import DeadlineExceeded, timeout_for
+from agents.response_cache import ResponseCache, fingerprint
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "Você é a Zafira, assistente inteligente."
+
+
 class AgenteConversaADMGroq:
     """
     Usa a Groq Chat Completions (compatível OpenAI) para conversa livre no modo ADM.
+
+    Respostas ficam num ResponseCache indexado por (prompt de sistema, últimas
+    `context_turns` mensagens anteriores, mensagem), todos normalizados.
+    O padrão é 1: follow-ups como "e ontem?" ou "sim" dependem da mensagem
+    anterior e não podem herdar a resposta de outra conversa. Com
+    context_turns=0 a mesma pergunta reaproveita a resposta em qualquer
+    ponto da conversa (só use se as perguntas do ADM forem independentes).
     """
     API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
-    def __init__(self):
+    def __init__(self, cache: ResponseCache = None, context_turns: int = 1):
         # O typo no seu .env é GROP_APP_KEY; ajustamos aqui:
-        self.token = os.getenv("GROP_APP_KEY")  
+        self.token = os.getenv("GROP_APP_KEY")
+        self.cache = cache
+        self.context_turns = context_turns
+
+    def responder(self, history: list[str], message: str, deadline=None, reserve: float = 0.0) -> str:
+        if self.cache is None:
+            return self._completar(history, message, deadline, reserve)
+
+        # O histórico da sessão já termina com a própria mensagem
+        prior = history[:-1] if history and history[-1] == message else history
+        context = prior[-self.context_turns:] if self.context_turns else []
+        key = fingerprint(SYSTEM_PROMPT, context, message)
+        cached = self.cache.get(key, request=(context, message))
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        reply = self._completar(history, message, deadline, reserve)
+        self.cache.put(key, reply, cost=time.monotonic() - started)
+        return reply
+
+    def precompute(self, limit: int = 5, deadline=None) -> int:
+        """
+        Recalcula as perguntas mais frequentes que estão fora do cache ou
+        perto de expirar. Chamado em momentos ociosos; retorna quantas gerou.
+        """
+        if self.cache is None:
+            return 0
+        done = 0
+        for key, (context, message) in self.cache.popular(limit):
+            started = time.monotonic()
+            try:
+                reply = self._completar(context + [message], message, deadline)
+            except (DeadlineExceeded, requests.RequestException) as e:
+                logger.warning(f"[ADM CACHE] precompute falhou: {e}")
+                break
+            self.cache.put(key, reply, cost=time.monotonic() - started, precomputed=True)
+            done += 1
+        return done
 
-    def responder(self, history: list[str], message: str) -> str:
+    def _completar(self, history: list[str], message: str, deadline=None, reserve: float = 0.0) -> str:
         # Monta o corpo da requisição no formato OpenAI
-        messages = [{"role": "system", "content": "Você é a Zafira, assistente inteligente."}]
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
         # Adiciona histórico de mensagens (contexto)
         for h in history:
             messages.append({"role": "user", "content": h})
@@ -33,7 +88,11 @@ class AgenteConversaADMGroq:
             "temperature": 0.7
         }
 
-        resp = requests.post(self.API_URL, headers=headers, json=payload)
+        timeout = timeout_for(deadline, 20, reserve)
+        try:
+            resp = requests.post(self.API_URL, headers=headers, json=payload, timeout=timeout)
+        except requests.Timeout as e:
+            raise DeadlineExceeded(f"Groq não respondeu em {timeout:.1f}s") from e
         resp.raise_for_status()
         data = resp.json()
         return data["choices"][0]["message"]["content"].strip()
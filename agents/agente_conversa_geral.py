@@ -2,29 +2,37 @@
 
 import re
 
+from agents.message_normalizer import normalize
+
+# Padrões compilados uma vez, aplicados ao texto normalizado (minúsculo e sem acento)
+PADROES = [
+    (re.compile(r"\b(oi|ola|e ai)\b"),
+     "Oi! 😊 Em que posso ajudar hoje?"),
+    (re.compile(r"\b(bom dia|boa tarde|boa noite)\b"),
+     lambda m: f"{m.group(1).capitalize()}! Como você está?"),
+    (re.compile(r"\b(como vai|tudo bem|tudo bom)\b"),
+     "Estou bem, obrigado! E você?"),
+    (re.compile(r"\b(qual seu nome|quem e voce)\b"),
+     "Eu sou a Zafira, sua assistente de compras e conversa!"),
+    (re.compile(r"\b(o que voce faz|para que voce serve)\b"),
+     "Posso ajudar a buscar produtos, responder perguntas e bater papo!"),
+    (re.compile(r"\b(clima|tempo)\b"),
+     "Por aqui está um dia agradável ☀️. Quer ver produtos ou saber algo mais?"),
+]
+
+
 class AgenteConversaGeral:
     """
     Reconhece e responde small talk via expressões regulares.
     """
     def __init__(self):
-        self.padroes = [
-            (r"\b(oi|olá|ola|e aí)\b",
-             "Oi! 😊 Em que posso ajudar hoje?"),
-            (r"\b(bom dia|boa tarde|boa noite)\b",
-             lambda m: f"{m.group(1).capitalize()}! Como você está?"),
-            (r"\b(como vai|tudo bem|tudo bom)\b",
-             "Estou bem, obrigado! E você?"),
-            (r"\b(qual seu nome|quem é você)\b",
-             "Eu sou a Zafira, sua assistente de compras e conversa!"),
-            (r"\b(o que você faz|para que você serve)\b",
-             "Posso ajudar a buscar produtos, responder perguntas e bater papo!"),
-            (r"\b(clima|tempo)\b",
-             "Por aqui está um dia agradável ☀️. Quer ver produtos ou saber algo mais?"),
-        ]
+        self.padroes = PADROES
 
-    def responder(self, texto: str) -> str | None:
+    def responder(self, texto) -> str | None:
+        """`texto` pode ser str ou NormalizedMessage."""
+        t = normalize(texto).folded
         for padrao, resposta in self.padroes:
-            m = re.search(padrao, texto, re.IGNORECASE)
+            m = padrao.search(t)
             if m:
                 return resposta(m) if callable(resposta) else resposta
         return None
@@ -0,0 +1,338 @@
+# agents/analytics.py
+
+import os
+import math
+import glob
+import json
+import time
+import atexit
+import base64
+import hashlib
+import logging
+import socket
+import threading
+import uuid
+from array import array
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash128(item: str) -> tuple[int, int]:
+    """Dois hashes de 64 bits estáveis entre processos (hash() não é)."""
+    d = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidade (usuários únicos) com 2^p registradores de
+    1 byte: p=12 ocupa 4 KiB e tem erro padrão ~1,6%, não importa o tráfego.
+    """
+    def __init__(self, p: int = 12, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+
+    def add_hash(self, h: int):
+        idx  = h >> (64 - self.p)
+        w    = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def add(self, item: str):
+        self.add_hash(_hash128(item)[0])
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog"):
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+
+
+class CountMinSketch:
+    """
+    Contagem aproximada de frequência (nunca subestima) em memória fixa:
+    depth × width contadores de 64 bits.
+    """
+    def __init__(self, width: int = 2048, depth: int = 4, table: bytes = None):
+        self.width = width
+        self.depth = depth
+        self.table = array("Q")
+        if table:
+            self.table.frombytes(table)
+        else:
+            self.table.extend([0] * (width * depth))
+
+    def _cells(self, item: str):
+        h1, h2 = _hash128(item)
+        w = self.width
+        return [row * w + ((h1 + row * h2) & _MASK64) % w for row in range(self.depth)]
+
+    def add(self, item: str, n: int = 1) -> int:
+        """Soma `n` ao item e devolve a nova estimativa."""
+        est = None
+        for c in self._cells(item):
+            self.table[c] += n
+            v = self.table[c]
+            est = v if est is None or v < est else est
+        return est
+
+    def estimate(self, item: str) -> int:
+        return min(self.table[c] for c in self._cells(item))
+
+    def merge(self, other: "CountMinSketch"):
+        t = self.table
+        for i, v in enumerate(other.table):
+            t[i] += v
+
+
+class UsageAnalytics:
+    """
+    Métricas de uso em memória constante, alimentadas por ZafiraCore:
+      - usuários únicos por hora (últimas `keep_hours`) e por dia (`keep_days`)
+        com HyperLogLog;
+      - contadores por intent, por dia;
+      - termos de busca mais frequentes (count-min sketch + top-k);
+      - cliques nas listas de produtos (impressões x seleções), com as
+        ofertas de broadcast contadas à parte das listas de busca.
+
+    Cada processo grava periodicamente um snapshot em
+    `<data_dir>/<host>-<pid>-<sufixo>.json`; report() soma os snapshots de
+    todos os workers (HLL por máximo, contadores por soma). O sufixo é
+    aleatório por processo: depois de um restart o container costuma repetir
+    hostname e pids, e o worker novo não pode sobrescrever o arquivo do antigo.
+    """
+    def __init__(self, data_dir: str = "data/analytics", flush_interval: float = 60.0,
+                 p: int = 12, keep_hours: int = 48, keep_days: int = 7, top_k: int = 20):
+        self.data_dir       = data_dir
+        self.flush_interval = flush_interval
+        self.p          = p
+        self.keep_hours = keep_hours
+        self.keep_days  = keep_days
+        self.top_k      = top_k
+        self._lock      = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._process    = None   # (pid, sufixo) do processo dono do snapshot
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.hours   = {}   # { "AAAA-MM-DDTHH": HyperLogLog }
+        self.days    = {}   # { "AAAA-MM-DD": HyperLogLog }
+        self.intents = {}   # { "AAAA-MM-DD": { intent: n } }
+        self.searches = CountMinSketch()
+        self.top_searches = {}   # { termo: estimativa }, até top_k itens
+        self.impressions = 0
+        self.clicks      = [0, 0, 0]   # cliques por posição na lista
+        self.broadcast_impressions = 0  # listas de oferta entregues
+        self.broadcast_clicks      = 0
+        self._dirty      = False
+
+    # ------------------------------------------------------------ registro
+
+    def record_message(self, sender_id: str, intent: str, now: datetime = None):
+        now = now or datetime.utcnow()
+        day, hour = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%dT%H")
+        h = _hash128(sender_id)[0]
+        with self._lock:
+            self._hll(self.hours, hour, self.keep_hours).add_hash(h)
+            self._hll(self.days, day, self.keep_days).add_hash(h)
+            counts = self.intents.setdefault(day, {})
+            counts[intent] = counts.get(intent, 0) + 1
+            self._dirty = True
+            self._trim(self.intents, self.keep_days)
+        self.maybe_flush()
+
+    def record_search(self, terms: str):
+        terms = terms.strip()
+        if not terms:
+            return
+        with self._lock:
+            est = self.searches.add(terms)
+            self._dirty = True
+            top = self.top_searches
+            if terms in top or len(top) < self.top_k:
+                top[terms] = est
+            else:
+                weakest = min(top, key=top.get)
+                if est > top[weakest]:
+                    del top[weakest]
+                    top[terms] = est
+
+    def record_impression(self, broadcast: bool = False):
+        with self._lock:
+            if broadcast:
+                self.broadcast_impressions += 1
+            else:
+                self.impressions += 1
+            self._dirty = True
+
+    def record_click(self, position: int, broadcast: bool = False):
+        with self._lock:
+            self._dirty = True
+            if broadcast:
+                self.broadcast_clicks += 1
+                return
+            while len(self.clicks) < position:
+                self.clicks.append(0)
+            self.clicks[position - 1] += 1
+
+    def _hll(self, buckets: dict, key: str, keep: int) -> HyperLogLog:
+        hll = buckets.get(key)
+        if hll is None:
+            hll = buckets[key] = HyperLogLog(self.p)
+            self._trim(buckets, keep)
+        return hll
+
+    @staticmethod
+    def _trim(buckets: dict, keep: int):
+        # Chaves são datas ISO, então a ordem alfabética é a cronológica
+        for key in sorted(buckets)[:-keep]:
+            del buckets[key]
+
+    # ------------------------------------------------------- snapshots
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "p":            self.p,
+                "hours":        {k: _b64(v.registers) for k, v in self.hours.items()},
+                "days":         {k: _b64(v.registers) for k, v in self.days.items()},
+                "intents":      {k: dict(v) for k, v in self.intents.items()},
+                "cms":          {"width": self.searches.width, "depth": self.searches.depth,
+                                 "table": _b64(self.searches.table.tobytes())},
+                "top_searches": list(self.top_searches),
+                "impressions":  self.impressions,
+                "clicks":       list(self.clicks),
+                "broadcast_impressions": self.broadcast_impressions,
+                "broadcast_clicks":      self.broadcast_clicks,
+            }
+
+    def _snapshot_path(self) -> str:
+        # O pid é lido na hora: com --preload o objeto nasce no master e é herdado
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            self._process = (pid, uuid.uuid4().hex[:8])
+        return os.path.join(self.data_dir, f"{socket.gethostname()}-{pid}-{self._process[1]}.json")
+
+    def flush(self):
+        with self._flush_lock:
+            self._flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        # Se outra thread já está gravando, não espera por ela
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self._flush()
+            finally:
+                self._flush_lock.release()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        snap = self.snapshot()
+        path = self._snapshot_path()
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Erro ao gravar snapshot de analytics: {e}")
+
+    def _load_snapshots(self) -> list[dict]:
+        """Snapshots dos outros processos (ignora os antigos demais)."""
+        own = self._snapshot_path()
+        cutoff = time.time() - self.keep_days * 86400
+        snaps = []
+        for path in glob.glob(os.path.join(self.data_dir, "*.json")):
+            if path == own:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    # Cada restart deixa um arquivo novo: os velhos são apagados aqui
+                    os.remove(path)
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    snaps.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snaps
+
+    @staticmethod
+    def merge(snapshots: list[dict], top_k: int = 20) -> dict:
+        """Combina snapshots em um resumo: únicos, intents, buscas e cliques."""
+        hours, days, intents = {}, {}, {}
+        cms, candidates = None, set()
+        impressions, clicks = 0, []
+        bc_impressions = bc_clicks = 0
+        for snap in snapshots:
+            p = snap.get("p", 12)
+            for target, key in ((hours, "hours"), (days, "days")):
+                for k, regs in snap.get(key, {}).items():
+                    hll = HyperLogLog(p, base64.b64decode(regs))
+                    if k in target:
+                        target[k].merge(hll)
+                    else:
+                        target[k] = hll
+            for day, counts in snap.get("intents", {}).items():
+                merged = intents.setdefault(day, {})
+                for intent, n in counts.items():
+                    merged[intent] = merged.get(intent, 0) + n
+            c = snap.get("cms")
+            if c:
+                sketch = CountMinSketch(c["width"], c["depth"], base64.b64decode(c["table"]))
+                if cms is None:
+                    cms = sketch
+                else:
+                    cms.merge(sketch)
+            candidates.update(snap.get("top_searches", []))
+            impressions += snap.get("impressions", 0)
+            for i, n in enumerate(snap.get("clicks", [])):
+                if i >= len(clicks):
+                    clicks.append(0)
+                clicks[i] += n
+            bc_impressions += snap.get("broadcast_impressions", 0)
+            bc_clicks      += snap.get("broadcast_clicks", 0)
+
+        top = []
+        if cms is not None:
+            top = sorted(((t, cms.estimate(t)) for t in candidates), key=lambda x: (-x[1], x[0]))[:top_k]
+        return {
+            "unique_by_hour": {k: v.count() for k, v in sorted(hours.items())},
+            "unique_by_day":  {k: v.count() for k, v in sorted(days.items())},
+            "intents":        dict(sorted(intents.items())),
+            "top_searches":   top,
+            "impressions":    impressions,
+            "clicks":         clicks,
+            "broadcast_impressions": bc_impressions,
+            "broadcast_clicks":      bc_clicks,
+        }
+
+    def report(self) -> dict:
+        """Resumo de todos os workers, incluindo o estado em memória deste."""
+        return self.merge([self.snapshot()] + self._load_snapshots(), self.top_k)
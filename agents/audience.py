@@ -0,0 +1,88 @@
+# agents/audience.py
+
+import os
+import glob
+import shutil
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from agents.message_normalizer import normalize, fold
+
+logger = logging.getLogger(__name__)
+
+
+class AudienceLog:
+    """
+    Registro em disco de quem falou com a Zafira, compartilhado entre os
+    workers para que o broadcast alcance todos os usuários, não só os que
+    caíram no processo do ADM.
+
+    Cada processo anexa linhas "sender<TAB>termos" em
+    `<data_dir>/<AAAA-MM-DD>/<host>-<pid>.log`; diretórios com mais de
+    `keep_days` dias são apagados. Só os termos de busca da mensagem são
+    gravados (sem acento, sem stopwords e sem números, que podem ser
+    telefone ou CPF): o texto em si nunca vai para o disco.
+    """
+    def __init__(self, data_dir: str = "data/audience", keep_days: int = 30,
+                 process_name: str = None):
+        self.data_dir     = data_dir
+        self.keep_days    = keep_days
+        self.process_name = process_name
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_key = None   # (dia, pid) do arquivo aberto
+
+    def _name(self) -> str:
+        # O pid é lido na hora: com --preload o objeto nasce no master
+        return self.process_name or f"{socket.gethostname()}-{os.getpid()}"
+
+    def record(self, sender_id: str, message, now: datetime = None):
+        """`message` pode ser str ou NormalizedMessage."""
+        day   = (now or datetime.utcnow()).strftime("%Y-%m-%d")
+        terms = dict.fromkeys(fold(t) for t in normalize(message).terms if t.isalpha())
+        line  = f"{sender_id}\t{' '.join(terms)}\n"
+        with self._lock:
+            try:
+                if self._file_key != (day, os.getpid()):
+                    self._open(day)
+                self._file.write(line)
+            except OSError as e:
+                logger.error(f"Erro ao gravar audiência: {e}")
+
+    def _open(self, day: str):
+        if self._file is not None:
+            self._file.close()
+        folder = os.path.join(self.data_dir, day)
+        os.makedirs(folder, exist_ok=True)
+        # Line-buffered: cada linha chega ao disco sem esperar o fechamento
+        self._file = open(os.path.join(folder, f"{self._name()}.log"), "a",
+                          encoding="utf-8", buffering=1)
+        self._file_key = (day, os.getpid())
+        self._prune(day)
+
+    def _prune(self, today: str):
+        cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=self.keep_days)).strftime("%Y-%m-%d")
+        for folder in glob.glob(os.path.join(self.data_dir, "????-??-??")):
+            if os.path.basename(folder) < cutoff:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def senders(self, term: str = None) -> list[str]:
+        """
+        Senders de todos os workers, na ordem em que apareceram. Com `term`,
+        só os que já escreveram algo contendo o termo (sem diferenciar caixa
+        nem acento: "relógio" acha quem escreveu "relogio" e vice-versa).
+        """
+        term = fold(term.lower()) if term else None
+        seen = {}
+        for path in sorted(glob.glob(os.path.join(self.data_dir, "????-??-??", "*.log"))):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        sid, _, text = line.rstrip("\n").partition("\t")
+                        if term is None or term in text:
+                            seen.setdefault(sid, None)
+            except OSError:
+                continue
+        return list(seen)
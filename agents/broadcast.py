@@ -0,0 +1,434 @@
+# agents/broadcast.py
+
+import os
+import glob
+import json
+import time
+import uuid
+import fcntl
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.rate_limiter import RateGate
+from agents.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_KINDS = ("text", "image", "list")
+
+# Intervalo (s) entre gravações do progresso e checagens de cancelamento
+PROGRESS_INTERVAL = 0.5
+
+
+class JobRunning(RuntimeError):
+    """O job já está em execução (neste ou em outro worker)."""
+
+
+class BroadcastJob:
+    """
+    Estado de um envio em massa. Tudo que outro worker precisa saber fica em
+    arquivos no diretório de dados:
+      <job_id>.json          – destinatários e conteúdo (escrito uma vez)
+      <job_id>.info.json     – tipo, total e criação (pequeno, p/ status)
+      <job_id>.extra.json    – dados extras (ex.: produtos de uma lista)
+      <job_id>.log           – uma linha "ok|fail<TAB>destinatário" por envio
+      <job_id>.progress.json – progresso da execução atual, regravado pelo dono
+      <job_id>.lock          – flock exclusivo enquanto o job roda
+      <job_id>.cancel        – pedido de cancelamento (de qualquer worker)
+    Ao retomar, quem já aparece no .log é pulado.
+    """
+    def __init__(self, job_id: str, kind: str, payload: dict, recipients: list[str]):
+        self.job_id     = job_id
+        self.kind       = kind
+        self.payload    = payload
+        self.recipients = recipients
+        self.sent       = 0
+        self.failed     = 0
+        self.skipped    = 0      # já concluídos em uma execução anterior
+        self.started_at  = None
+        self.finished_at = None
+        self.cancelled   = False
+        self._thread     = None
+
+    @property
+    def total(self) -> int:
+        return len(self.recipients)
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed + self.skipped
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None and self.finished_at is None
+
+    def progress(self) -> dict:
+        end = self.finished_at or time.monotonic()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        processed = self.sent + self.failed
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        return {
+            "job_id":     self.job_id,
+            "kind":       self.kind,
+            "total":      self.total,
+            "sent":       self.sent,
+            "failed":     self.failed,
+            "skipped":    self.skipped,
+            "remaining":  remaining,
+            "elapsed_s":  round(elapsed, 1),
+            "rate_per_s": round(rate, 1),
+            "eta_s":      round(remaining / rate, 1) if rate > 0 else None,
+            "running":    self.running,
+            "cancelled":  self.cancelled,
+        }
+
+
+class BroadcastEngine:
+    """
+    Envia uma oferta (texto, imagem ou lista) para muitos usuários em
+    segundo plano. Os envios são feitos em paralelo por `workers` threads;
+    a vazão por número é imposta pelo WhatsAppClient, e `rate_per_sec`, se
+    informado, é um teto adicional para o job inteiro.
+    Falhas são retentadas com backoff exponencial e o progresso é gravado
+    em disco a cada envio, permitindo retomar o job após um restart.
+
+    status(), cancel() e resume() funcionam a partir de qualquer worker: leem
+    os arquivos do job, e o flock em <job_id>.lock impede duas execuções
+    simultâneas do mesmo job.
+
+    `on_sent(job, recipient)`, se informado, é chamado a cada entrega bem
+    sucedida (ex.: contar impressões das ofertas em lista).
+    """
+    def __init__(self, whatsapp, data_dir: str = "data/broadcasts",
+                 rate_per_sec: float | None = None, workers: int = 16,
+                 max_retries: int = 3, backoff: float = 1.0, on_sent=None):
+        self.whatsapp    = whatsapp
+        self.data_dir    = data_dir
+        self.rate_per_sec = rate_per_sec
+        self.workers     = workers
+        self.max_retries = max_retries
+        self.backoff     = backoff
+        self.on_sent     = on_sent
+        self.jobs        = {}   # { job_id: BroadcastJob }
+        self._lock       = threading.Lock()
+        self._extras     = LRUCache(64)   # extras não mudam depois de gravados
+
+    # ------------------------------------------------------------------ API
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex[:8]
+
+    def start(self, recipients: list[str], kind: str, payload: dict,
+              job_id: str = None, extra: dict = None) -> BroadcastJob:
+        """
+        Inicia o envio. `extra` é gravado junto do job (ex.: os produtos de
+        uma oferta em lista, para resolver a seleção feita pelo usuário).
+        """
+        if kind not in BROADCAST_KINDS:
+            raise ValueError(f"Tipo de broadcast inválido: {kind}")
+        job = BroadcastJob(job_id or self.new_job_id(), kind, payload, list(recipients))
+        os.makedirs(self.data_dir, exist_ok=True)
+        lock_fd = self._try_lock(job.job_id)
+        if lock_fd is None:
+            raise JobRunning(job.job_id)
+        self._write_meta(job, extra or {})
+        return self._launch(job, lock_fd, already_done=set())
+
+    def resume(self, job_id: str) -> BroadcastJob:
+        """Retoma um job parado. Levanta JobRunning se ele ainda estiver rodando."""
+        meta_path = self._meta_path(job_id)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(meta_path)
+        lock_fd = self._try_lock(job_id)
+        if lock_fd is None:
+            raise JobRunning(job_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self._remove(self._cancel_path(job_id))
+        except BaseException:
+            os.close(lock_fd)
+            raise
+        job = BroadcastJob(job_id, meta["kind"], meta["payload"], meta["recipients"])
+        return self._launch(job, lock_fd, already_done=self._read_log(job_id))
+
+    def extra(self, job_id: str) -> dict:
+        """Dados extras gravados com o job (lidos do disco, vale entre workers)."""
+        extra = self._extras.get(job_id)
+        if extra is None:
+            extra = self._read_json(self._path(job_id, ".extra.json"))
+            if extra is None:
+                return {}
+            self._extras.put(job_id, extra)
+        return extra
+
+    def cancel(self, job_id: str) -> bool:
+        """Pede o cancelamento; o worker que roda o job o vê em até PROGRESS_INTERVAL."""
+        job = self.jobs.get(job_id)
+        if job is not None and job.running:
+            job.cancelled = True
+        elif not self.is_running(job_id):
+            return False
+        with open(self._cancel_path(job_id), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        return True
+
+    def is_running(self, job_id: str) -> bool:
+        """Se algum processo segura o lock do job."""
+        if not os.path.exists(self._meta_path(job_id)):
+            return False
+        fd = self._try_lock(job_id)
+        if fd is None:
+            return True
+        os.close(fd)
+        return False
+
+    def status(self, job_id: str = None) -> dict | None:
+        """Progresso do job (ou do mais recente), visto de qualquer worker."""
+        if job_id is None:
+            job_id = self._latest_job_id()
+            if job_id is None:
+                return None
+        job = self.jobs.get(job_id)
+        if job is not None and job.running:
+            return job.progress()
+
+        info = self._read_json(self._info_path(job_id))
+        if info is None:
+            return None
+        running  = self.is_running(job_id)
+        progress = self._read_json(self._progress_path(job_id))
+        if running and progress is not None:
+            return progress
+
+        # Parado (ou dono morto): o .log é a fonte da verdade das contagens;
+        # vazão e duração vêm da última execução, se houver
+        sent, failed = self._read_log_counts(job_id)
+        last = progress or {}
+        return {
+            "job_id":     job_id,
+            "kind":       info["kind"],
+            "total":      info["total"],
+            "sent":       sent,
+            "failed":     failed,
+            "skipped":    0,
+            "remaining":  info["total"] - sent - failed,
+            "elapsed_s":  last.get("elapsed_s"),
+            "rate_per_s": last.get("rate_per_s", 0.0),
+            "eta_s":      None,
+            "running":    running,
+            "cancelled":  os.path.exists(self._cancel_path(job_id)),
+        }
+
+    def wait(self, job_id: str, timeout: float = None) -> bool:
+        job = self.jobs.get(job_id)
+        thread = job._thread if job else None
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    # ------------------------------------------------------------ execução
+
+    def _launch(self, job: BroadcastJob, lock_fd: int, already_done: set) -> BroadcastJob:
+        pending = [r for r in job.recipients if r not in already_done]
+        job.skipped = job.total - len(pending)
+        job.started_at = time.monotonic()
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._write_progress(job)
+        job._thread = threading.Thread(
+            target=self._run, args=(job, pending, lock_fd),
+            name=f"broadcast-{job.job_id}", daemon=True,
+        )
+        job._thread.start()
+        logger.info(f"[BROADCAST] {job.job_id}: {len(pending)}/{job.total} destinatários pendentes")
+        return job
+
+    def _run(self, job: BroadcastJob, pending: list[str], lock_fd: int):
+        try:
+            self._send_all(job, pending)
+        finally:
+            job.finished_at = time.monotonic()
+            self._write_progress(job)
+            os.close(lock_fd)   # libera o flock: o job pode ser retomado
+        p = job.progress()
+        logger.info(
+            f"[BROADCAST] {job.job_id} finalizado: {p['sent']} enviados, "
+            f"{p['failed']} falhas, {p['rate_per_s']} msg/s"
+        )
+
+    def _send_all(self, job: BroadcastJob, pending: list[str]):
+        gate = RateGate(self.rate_per_sec) if self.rate_per_sec else None
+        log_lock = threading.Lock()
+        # Limita o número de envios enfileirados para não criar 100k futures
+        slots = threading.BoundedSemaphore(self.workers * 2)
+
+        with open(self._log_path(job.job_id), "a", encoding="utf-8") as log, \
+                ThreadPoolExecutor(max_workers=self.workers,
+                                   thread_name_prefix=f"bc-{job.job_id}") as pool:
+
+            def task(recipient):
+                try:
+                    ok = self._send_with_retry(job, recipient, gate)
+                    if ok is None:   # cancelado: fica pendente para um resume
+                        return
+                    with log_lock:
+                        if ok:
+                            job.sent += 1
+                        else:
+                            job.failed += 1
+                        log.write(f"{'ok' if ok else 'fail'}\t{recipient}\n")
+                        log.flush()
+                    if ok and self.on_sent is not None:
+                        self.on_sent(job, recipient)
+                finally:
+                    slots.release()
+
+            last_check = 0.0
+            for recipient in pending:
+                now = time.monotonic()
+                if now - last_check >= PROGRESS_INTERVAL:
+                    last_check = now
+                    # O cancelamento pode vir de outro worker, pelo arquivo
+                    if os.path.exists(self._cancel_path(job.job_id)):
+                        job.cancelled = True
+                    self._write_progress(job)
+                if job.cancelled:
+                    break
+                slots.acquire()
+                pool.submit(task, recipient)
+
+    def _send_with_retry(self, job: BroadcastJob, recipient: str, gate: RateGate = None) -> bool | None:
+        for attempt in range(self.max_retries + 1):
+            if job.cancelled:
+                return None
+            if gate is not None:
+                gate.acquire()
+            try:
+                if self._dispatch(job, recipient):
+                    return True
+            except Exception as e:
+                logger.error(f"[BROADCAST] {job.job_id} exceção para {recipient}: {e}")
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        return False
+
+    def _dispatch(self, job: BroadcastJob, recipient: str) -> bool:
+        p = job.payload
+        if job.kind == "text":
+            return self.whatsapp.send_text_message(recipient, p["body"], proactive=True)
+        if job.kind == "image":
+            return self.whatsapp.send_media_message(recipient, p["url"], p.get("caption", ""), proactive=True)
+        return self.whatsapp.send_list_message(recipient, **p, proactive=True)
+
+    # ---------------------------------------------------------- persistência
+
+    def _meta_path(self, job_id: str) -> str:
+        return self._path(job_id, ".json")
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        if not job_id.isalnum():
+            raise ValueError(f"job_id inválido: {job_id!r}")
+        return os.path.join(self.data_dir, f"{job_id}{suffix}")
+
+    def _log_path(self, job_id: str) -> str:
+        return self._path(job_id, ".log")
+
+    def _info_path(self, job_id: str) -> str:
+        return self._path(job_id, ".info.json")
+
+    def _progress_path(self, job_id: str) -> str:
+        return self._path(job_id, ".progress.json")
+
+    def _cancel_path(self, job_id: str) -> str:
+        return self._path(job_id, ".cancel")
+
+    def _try_lock(self, job_id: str) -> int | None:
+        """Descritor com flock exclusivo do job, ou None se outro o segura."""
+        fd = os.open(self._path(job_id, ".lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _latest_job_id(self) -> str | None:
+        infos = glob.glob(os.path.join(self.data_dir, "*.info.json"))
+        if not infos:
+            return None
+        newest = max(infos, key=os.path.getmtime)
+        return os.path.basename(newest)[:-len(".info.json")]
+
+    @staticmethod
+    def _read_json(path: str) -> dict | None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _write_progress(self, job: BroadcastJob):
+        try:
+            self._write_json(self._progress_path(job.job_id), job.progress())
+        except OSError as e:
+            logger.error(f"[BROADCAST] {job.job_id}: erro ao gravar progresso: {e}")
+
+    def _write_meta(self, job: BroadcastJob, extra: dict):
+        created_at = time.time()
+        self._write_json(self._meta_path(job.job_id), {
+            "job_id":     job.job_id,
+            "kind":       job.kind,
+            "payload":    job.payload,
+            "recipients": job.recipients,
+            "created_at": created_at,
+        })
+        self._write_json(self._path(job.job_id, ".extra.json"), extra)
+        self._write_json(self._info_path(job.job_id), {
+            "job_id":     job.job_id,
+            "kind":       job.kind,
+            "total":      job.total,
+            "created_at": created_at,
+        })
+
+    def _read_log(self, job_id: str) -> set:
+        done = set()
+        try:
+            with open(self._log_path(job_id), encoding="utf-8") as f:
+                for line in f:
+                    _, _, recipient = line.rstrip("\n").partition("\t")
+                    if recipient:
+                        done.add(recipient)
+        except FileNotFoundError:
+            pass
+        return done
+
+    def _read_log_counts(self, job_id: str) -> tuple[int, int]:
+        sent = failed = 0
+        try:
+            with open(self._log_path(job_id), encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("ok\t"):
+                        sent += 1
+                    elif line.startswith("fail\t"):
+                        failed += 1
+        except FileNotFoundError:
+            pass
+        return sent, failed
@@ -0,0 +1,35 @@
+# agents/lru_cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Dicionário com no máximo `max_items` chaves, seguro entre threads.
+    Ao passar do limite descarta a chave usada há mais tempo.
+    """
+    def __init__(self, max_items: int = 10_000):
+        self.max_items = max_items
+        self._items    = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,129 @@
+# agents/message_normalizer.py
+
+import re
+import unicodedata
+
+# Palavras ignoradas ao montar os termos de busca (já sem acento)
+STOPWORDS = frozenset({"quero", "procuro", "comprar", "busco", "ate", "reais"})
+
+_PUNCT_RE  = re.compile(r"[^\w\s]")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# "100 até 200", "100-200" e "até 150" (no texto já sem acento)
+_RANGE_RE  = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:\bate\b|-)\s*(\d+(?:[.,]\d+)?)")
+_MAX_RE    = re.compile(r"\bate\s*(\d+(?:[.,]\d+)?)")
+
+
+# Diacríticos que sobram do NFKD ("ã" -> "a" + "~"); emoji e afins ficam
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]+")
+
+
+def _nfkd_fold(text: str) -> str:
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+
+
+# O português cabe no Latin-1: lá o fold vira uma tabela de bytes, gerada a
+# partir do próprio NFKD. Os poucos caracteres que o NFKD expande ou leva para
+# fora do Latin-1 ("½", "µ") mandam o texto para o caminho lento.
+_LATIN1_FOLD = bytes(
+    ord(f) if len(f := _nfkd_fold(chr(b))) == 1 and ord(f) < 256 else b
+    for b in range(256)
+)
+_LATIN1_SLOW = re.compile(b"[" + re.escape(bytes(
+    b for b in range(256)
+    if len(f := _nfkd_fold(chr(b))) != 1 or ord(f) >= 256
+)) + b"]")
+
+
+def fold(text: str) -> str:
+    """Remove acentos: 'Olá, câmera' -> 'Ola, camera'."""
+    if text.isascii():
+        return text
+    try:
+        data = text.encode("latin-1")
+    except UnicodeEncodeError:
+        return _nfkd_fold(text)
+    if _LATIN1_SLOW.search(data):
+        return _nfkd_fold(text)
+    return data.translate(_LATIN1_FOLD).decode("latin-1")
+
+
+class _lazy:
+    """
+    Como functools.cached_property, mas sem o RLock que ele pega a cada
+    primeira leitura até o Python 3.11: uma NormalizedMessage pertence a uma
+    única mensagem/thread, e o lock dominava o custo do normalize.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+        self.name = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.fn(obj)
+        return value
+
+
+def _to_float(num: str) -> float:
+    return float(num.replace(",", "."))
+
+
+class NormalizedMessage:
+    """
+    Mensagem pré-processada uma única vez e compartilhada pelo roteador de
+    intents e por todos os agentes, para que todos vejam a mesma tokenização.
+
+      raw         – texto original
+      folded      – minúsculo, sem acento, espaços colapsados (mantém pontuação)
+      clean       – `folded` sem pontuação
+      tokens      – palavras em minúsculo, sem pontuação (com acento, p/ exibir)
+      terms       – `tokens` sem stopwords (termos de busca)
+      numbers     – números encontrados, como float
+      price_range – (mínimo, máximo) de frases como '100 até 200' / 'até 150'
+
+    Todos os campos são calculados só na primeira leitura: o roteador lê
+    apenas `folded`, e `clean`/`tokens` só interessam a alguns agentes.
+    """
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    @_lazy
+    def folded(self) -> str:
+        return " ".join(fold(self.raw.lower()).split())
+
+    @_lazy
+    def clean(self) -> str:
+        return " ".join(_PUNCT_RE.sub("", self.folded).split())
+
+    @_lazy
+    def tokens(self) -> list[str]:
+        return _PUNCT_RE.sub("", self.raw.lower()).split()
+
+    @_lazy
+    def terms(self) -> list[str]:
+        return [t for t in self.tokens if fold(t) not in STOPWORDS]
+
+    @_lazy
+    def numbers(self) -> list[float]:
+        return [_to_float(n) for n in _NUMBER_RE.findall(self.folded)]
+
+    @_lazy
+    def price_range(self) -> tuple[float | None, float | None]:
+        m = _RANGE_RE.search(self.folded)
+        if m:
+            return _to_float(m.group(1)), _to_float(m.group(2))
+        m2 = _MAX_RE.search(self.folded)
+        if m2:
+            return None, _to_float(m2.group(1))
+        return None, None
+
+    def __repr__(self) -> str:
+        return f"NormalizedMessage({self.raw!r})"
+
+
+def normalize(message) -> NormalizedMessage:
+    """Aceita texto ou uma NormalizedMessage (devolvida sem recalcular)."""
+    if isinstance(message, NormalizedMessage):
+        return message
+    return NormalizedMessage(message)
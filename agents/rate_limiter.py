@@ -0,0 +1,173 @@
+# agents/rate_limiter.py
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Níveis devolvidos por LoadShedder.slot()
+LOAD_OK             = "ok"
+LOAD_SHED_EXPENSIVE = "shed_expensive"
+LOAD_SHED_ALL       = "shed_all"
+
+
+class TokenBucket:
+    """
+    Balde de tokens clássico: enche `rate` tokens por segundo até `capacity`.
+    Não é thread-safe; quem compartilha o balde deve proteger o acesso.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float = None):
+        self.rate     = rate
+        self.capacity = capacity
+        self.tokens   = capacity
+        self.updated  = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens  = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, n: float = 1.0, now: float = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def wait_time(self, n: float = 1.0, now: float = None) -> float:
+        """Segundos até haver `n` tokens disponíveis (0 se já houver)."""
+        self._refill(time.monotonic() if now is None else now)
+        missing = n - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+
+class SenderRateLimiter:
+    """
+    Um TokenBucket por sender_id, com memória limitada: os baldes ficam em
+    shards LRU (cada um com seu lock) e o sender menos recente é descartado
+    quando o shard enche. Um sender descartado volta com o balde cheio.
+    """
+    def __init__(self, per_minute: float = 20, burst: float = 10,
+                 max_senders: int = 100_000, shards: int = 16):
+        self.rate     = per_minute / 60.0
+        self.burst    = burst
+        self._per_shard = max(1, max_senders // shards)
+        self._shards  = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._throttled = 0
+        self._count_lock = threading.Lock()
+
+    def allow(self, sender_id: str) -> bool:
+        lock, buckets = self._shards[hash(sender_id) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(sender_id)
+            if bucket is None:
+                bucket = buckets[sender_id] = TokenBucket(self.rate, self.burst, now)
+                if len(buckets) > self._per_shard:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(sender_id)
+            allowed = bucket.try_acquire(now=now)
+        if not allowed:
+            with self._count_lock:
+                self._throttled += 1
+        return allowed
+
+    @property
+    def throttled(self) -> int:
+        return self._throttled
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._shards)
+
+
+class LoadShedder:
+    """
+    Degradação sob carga, medida onde a fila realmente se forma.
+
+    Num worker gthread nunca há mais mensagens em andamento que `threads`
+    (o excedente espera no backlog do gunicorn, fora do processo). Por isso:
+      - com mais de `max_inflight` mensagens em andamento (deve ficar abaixo
+        do nº de threads), as intents caras ganham uma resposta barata;
+      - a espera pelo lock do sender é a fila visível aqui dentro: quem
+        esperou mais que `expensive_wait` segundos também perde as intents
+        caras, e quem não obtém o lock em `max_wait` segundos é descartado.
+        Quem segura o lock pode levar o orçamento inteiro da mensagem (uma
+        busca lenta), então `max_wait` não deve ficar abaixo dele.
+    """
+    def __init__(self, max_inflight: int = 12, expensive_wait: float = 1.0, max_wait: float = 28.0):
+        self.max_inflight   = max_inflight
+        self.expensive_wait = expensive_wait
+        self.max_wait       = max_wait
+        self._lock        = threading.Lock()
+        self._inflight    = 0
+        self.shed_expensive = 0
+        self.shed_all       = 0
+
+    @contextmanager
+    def slot(self, lock=None):
+        """
+        Ocupa uma vaga e, se `lock` for dado, o adquire (até `max_wait`)
+        durante o bloco. Produz LOAD_OK, LOAD_SHED_EXPENSIVE ou LOAD_SHED_ALL.
+        """
+        with self._lock:
+            self._inflight += 1
+            current = self._inflight
+        acquired = False
+        try:
+            waited = 0.0
+            if lock is not None:
+                started  = time.monotonic()
+                acquired = lock.acquire(timeout=self.max_wait)
+                waited   = time.monotonic() - started
+            if lock is not None and not acquired:
+                with self._lock:
+                    self.shed_all += 1
+                yield LOAD_SHED_ALL
+            elif current > self.max_inflight or waited > self.expensive_wait:
+                yield LOAD_SHED_EXPENSIVE
+            else:
+                yield LOAD_OK
+        finally:
+            if acquired:
+                lock.release()
+            with self._lock:
+                self._inflight -= 1
+
+    def record_shed_expensive(self):
+        with self._lock:
+            self.shed_expensive += 1
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+
+class RateGate:
+    """
+    TokenBucket compartilhado entre threads: acquire() bloqueia até haver
+    token. Usado para respeitar a vazão máxima em envios em massa.
+    """
+    def __init__(self, rate: float, burst: float = None):
+        self._bucket = TokenBucket(rate, burst if burst is not None else max(1.0, rate))
+        self._lock   = threading.Lock()
+
+    def acquire(self, n: float = 1.0):
+        while True:
+            with self._lock:
+                wait = self._bucket.wait_time(n)
+                if wait <= 0:
+                    self._bucket.tokens -= n
+                    return
+            time.sleep(wait)
+
+    def try_acquire(self, n: float = 1.0) -> bool:
+        with self._lock:
+            return self._bucket.try_acquire(n)
+
+    def wait_time(self, n: float = 1.0) -> float:
+        with self._lock:
+            return self._bucket.wait_time(n)
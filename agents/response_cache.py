@@ -0,0 +1,110 @@
+# agents/response_cache.py
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from agents.message_normalizer import normalize
+
+
+def fingerprint(system: str, context: list[str], message: str) -> str:
+    """
+    Chave estável para (prompt de sistema, contexto relevante, mensagem).
+    Textos normalizados, então 'Quantos usuários hoje?' e 'quantos usuarios
+    hoje' caem na mesma entrada.
+    """
+    parts = [system] + [normalize(c).clean for c in context] + [normalize(message).clean]
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache LRU com TTL para respostas caras (LLM). Cada entrada guarda quanto
+    tempo a chamada original levou, para estimar a latência economizada.
+
+    Também conta quantas vezes cada chave foi pedida (até `max_tracked`
+    chaves) e guarda o pedido original, para que popular() indique o que vale
+    recalcular em segundo plano antes de expirar.
+    """
+    def __init__(self, max_entries: int = 512, ttl: float = 600.0,
+                 max_tracked: int = 2048, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl         = ttl
+        self.max_tracked = max_tracked
+        self._clock      = clock
+        self._entries    = OrderedDict()   # { chave: (resposta, expira_em, custo_s) }
+        self._requests   = {}              # { chave: [pedidos, pedido_original] }
+        self._lock       = threading.Lock()
+        self.hits       = 0
+        self.misses     = 0
+        self.saved_s    = 0.0
+        self.precomputed = 0
+
+    def get(self, key: str, request=None):
+        """Resposta em cache ou None. `request` é guardado para o precompute."""
+        now = self._clock()
+        with self._lock:
+            self._track(key, request)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_s += entry[2]
+            return entry[0]
+
+    def put(self, key: str, value, cost: float = 0.0, precomputed: bool = False):
+        with self._lock:
+            if precomputed:
+                self.precomputed += 1
+            self._entries[key] = (value, self._clock() + self.ttl, cost)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _track(self, key: str, request):
+        tracked = self._requests.get(key)
+        if tracked is not None:
+            tracked[0] += 1
+            return
+        if len(self._requests) >= self.max_tracked:
+            # Esquece a chave menos pedida para abrir espaço
+            del self._requests[min(self._requests, key=lambda k: self._requests[k][0])]
+        self._requests[key] = [1, request]
+
+    def popular(self, limit: int = 10, min_count: int = 2, refresh_ahead: float = 60.0) -> list:
+        """
+        Pedidos das chaves mais frequentes (ao menos `min_count` vezes) que
+        estão fora do cache ou expiram em menos de `refresh_ahead` segundos.
+        Retorna [(chave, pedido)].
+        """
+        now = self._clock()
+        with self._lock:
+            ranked = sorted(self._requests.items(), key=lambda kv: -kv[1][0])
+            out = []
+            for key, (count, request) in ranked:
+                if count < min_count or len(out) >= limit:
+                    break
+                entry = self._entries.get(key)
+                if request is not None and (entry is None or entry[1] - now < refresh_ahead):
+                    out.append((key, request))
+            return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":     len(self._entries),
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "hit_rate":    self.hits / total if total else 0.0,
+                "saved_s":     round(self.saved_s, 1),
+                "precomputed": self.precomputed,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,20 +1,28 @@
 # agents/session_manager.py
 
+from agents.striped_lock import StripedLock
+
+
 class SessionManager:
     """
     Gerencia o histórico de mensagens por usuário (sender_id).
     Mantém até max_len entradas para cada sessão.
+    Seguro para uso com várias threads: cada sender é protegido por um
+    lock do StripedLock, sem serializar usuários diferentes.
     """
-    def __init__(self, max_len: int = 10):
+    def __init__(self, max_len: int = 10, stripes: int = 64):
         self.max_len = max_len
         self.sessions = {}  # { sender_id: [mensagens] }
+        self._locks = StripedLock(stripes)
 
     def push(self, sender_id: str, message: str) -> list[str]:
-        hist = self.sessions.setdefault(sender_id, [])
-        hist.append(message)
-        if len(hist) > self.max_len:
-            hist.pop(0)
-        return hist
+        with self._locks.lock_for(sender_id):
+            hist = self.sessions.setdefault(sender_id, [])
+            hist.append(message)
+            if len(hist) > self.max_len:
+                hist.pop(0)
+            return list(hist)
 
     def get(self, sender_id: str) -> list[str]:
-        return self.sessions.get(sender_id, [])
+        with self._locks.lock_for(sender_id):
+            return list(self.sessions.get(sender_id, []))
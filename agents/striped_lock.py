@@ -0,0 +1,22 @@
+# agents/striped_lock.py
+
+import threading
+
+
+class StripedLock:
+    """
+    Conjunto fixo de locks indexados por hash da chave (lock striping).
+    Mensagens do mesmo sender_id caem sempre no mesmo lock (ordem garantida),
+    enquanto senders diferentes quase sempre usam locks distintos e rodam
+    em paralelo, sem um lock global.
+    """
+    def __init__(self, stripes: int = 64):
+        if stripes < 1:
+            raise ValueError("stripes deve ser >= 1")
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def lock_for(self, key: str) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
@@ -1,11 +1,20 @@
 # app.py
 
+import startup  # primeiro: marca o início do carregamento
+
 import os
+import logging
 from flask import Flask, request, jsonify
 from zafira_core import ZafiraCore
 
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
+# Só estado em memória e tabelas estáticas: os clientes de rede nascem no
+# primeiro uso, então isto é seguro de rodar no master com --preload
 zafira = ZafiraCore()
+startup.mark("app_ready_ms")
+logger.info(f"[STARTUP] app carregado, {startup.summary()}")
 
 def _get_first(arrays_dict: dict, *keys):
     """
@@ -26,45 +35,66 @@ def verify():
         return challenge, 200
     return "Forbidden", 403
 
-@app.route("/webhook", methods=["POST"])
-def webhook():
-    data = request.get_json(force=True, silent=True) or {}
-
+def _extract_message(data: dict) -> dict:
+    """
+    Extrai do payload do webhook os campos usados pela Zafira.
+    Retorna {"error": motivo} se faltar algo essencial, senão
+    {"sender_id", "body", "interactive", "phone_number_id"} (body/interactive
+    podem vir vazios; phone_number_id é o número da Zafira que recebeu).
+    """
     # 1) captura "entrada" ou "entry"
     entry = _get_first(data, "entrada", "entry")
     if not entry:
-        return jsonify(error="sem entrada"), 200
+        return {"error": "sem entrada"}
 
     # 2) captura "mudanças" ou "changes"
     change = _get_first(entry, "mudanças", "changes")
     if not change:
-        return jsonify(error="sem mudança"), 200
+        return {"error": "sem mudança"}
 
     # 3) captura payload real "valor" ou "value"
     value = change.get("valor") or change.get("value") or {}
     contacts = value.get("contatos") or value.get("contacts") or []
     if not contacts:
-        return jsonify(error="sem contatos"), 200
+        return {"error": "sem contatos"}
 
     sender_id = contacts[0].get("wa_id") or contacts[0].get("waId")
     if not sender_id:
-        return jsonify(error="sem remetente"), 200
+        return {"error": "sem remetente"}
+
+    phone_number_id = (value.get("metadata") or {}).get("phone_number_id")
 
     # 4) resposta de lista interativa
     interactive = value.get("interactive") or {}
     if interactive.get("type") == "list_reply":
         choice_id = (interactive.get("list_reply") or {}).get("id") or ""
-        zafira.process_message(sender_id, choice_id, interactive=interactive)
-        return jsonify(status="ok"), 200
+        return {"sender_id": sender_id, "body": choice_id, "interactive": interactive,
+                "phone_number_id": phone_number_id}
 
     # 5) mensagem de texto normal
+    body = ""
     messages = value.get("mensagens") or value.get("messages") or []
     if messages:
         text_obj = messages[0].get("texto") or messages[0].get("text") or {}
         body = text_obj.get("body") or ""
-        if body:
-            zafira.process_message(sender_id, body)
-            return jsonify(status="ok"), 200
+    return {"sender_id": sender_id, "body": body, "interactive": None,
+            "phone_number_id": phone_number_id}
+
+@app.route("/webhook", methods=["POST"])
+def webhook():
+    data = request.get_json(force=True, silent=True) or {}
+    msg = _extract_message(data)
+    if "error" in msg:
+        return jsonify(error=msg["error"]), 200
+
+    if msg["interactive"]:
+        zafira.process_message(msg["sender_id"], msg["body"], interactive=msg["interactive"],
+                               phone_number_id=msg["phone_number_id"])
+        return jsonify(status="ok"), 200
+
+    if msg["body"]:
+        zafira.process_message(msg["sender_id"], msg["body"], phone_number_id=msg["phone_number_id"])
+        return jsonify(status="ok"), 200
 
     # ignora outros eventos
     return jsonify(status="ignored"), 200
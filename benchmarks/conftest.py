@@ -0,0 +1,94 @@
+# benchmarks/conftest.py
+#
+# Micro-benchmarks dos caminhos quentes. Não rodam por padrão:
+#
+#   ZAFIRA_BENCH=1 python -m pytest benchmarks -q            # compara com baseline.json
+#   ZAFIRA_BENCH=1 BENCH_UPDATE=1 python -m pytest benchmarks  # regrava o baseline
+#
+# BENCH_THRESHOLD (padrão 0.30) é a piora relativa tolerada antes de falhar.
+# O baseline depende da máquina: regrave-o no mesmo ambiente em que o CI roda.
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+ENABLED   = os.getenv("ZAFIRA_BENCH") == "1"
+UPDATE    = os.getenv("BENCH_UPDATE") == "1"
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.30"))
+
+_results = {}
+
+
+def _load_baseline() -> dict:
+    try:
+        return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def measure(fn, repeat: int = 5, min_time: float = 0.05) -> float:
+    """Melhor tempo (s) por chamada de `fn`, calibrando o nº de iterações."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time:
+            break
+        number *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / number
+
+
+@pytest.fixture
+def bench(request):
+    """
+    bench(fn) mede `fn` e compara com o baseline gravado para o teste.
+    Falha se o tempo piorar mais que BENCH_THRESHOLD.
+    """
+    if not ENABLED:
+        pytest.skip("benchmarks desativados (use ZAFIRA_BENCH=1)")
+    name = request.node.name
+    baseline = _load_baseline()
+
+    def run(fn, **kwargs) -> float:
+        elapsed = measure(fn, **kwargs)
+        _results[name] = elapsed
+        base = baseline.get(name)
+        if base is not None and not UPDATE:
+            limit = base * (1 + THRESHOLD)
+            assert elapsed <= limit, (
+                f"{name}: {elapsed * 1e6:.1f}µs > {limit * 1e6:.1f}µs "
+                f"(baseline {base * 1e6:.1f}µs + {THRESHOLD:.0%})"
+            )
+        return elapsed
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    baseline = _load_baseline()
+    terminalreporter.section("benchmarks")
+    for name, elapsed in sorted(_results.items()):
+        base = baseline.get(name)
+        delta = f"{(elapsed / base - 1):+.1%}" if base else "novo"
+        terminalreporter.write_line(f"{name:<45} {elapsed * 1e6:>10.1f}µs  {delta}")
+
+
+def pytest_sessionfinish(session):
+    if UPDATE and _results:
+        baseline = _load_baseline()
+        baseline.update({k: round(v, 9) for k, v in _results.items()})
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n",
+                                 encoding="utf-8")
@@ -0,0 +1,88 @@
+# benchmarks/datagen.py
+#
+# Geradores determinísticos de entradas realistas para os benchmarks.
+
+import random
+
+PRODUTOS = [
+    "fone bluetooth", "tênis de corrida", "smartwatch", "carregador turbo",
+    "capinha de celular", "mochila notebook", "câmera de segurança", "air fryer",
+    "teclado mecânico", "mouse gamer", "caixa de som", "luminária led",
+    "garrafa térmica", "relógio masculino", "vestido floral", "panela elétrica",
+]
+MARCAS = ["Xiaomi", "Samsung", "JBL", "Lenovo", "Baseus", "Philco", "Mondial", "Ugreen"]
+
+TEMPLATES = [
+    "Oi Zafira, tudo bem?",
+    "olá! bom dia",
+    "Boa tarde, como vai?",
+    "Quero um {p}",
+    "quero {p} até {a} reais",
+    "Procuro {p} de {a} até {b}",
+    "busco {p} {m} entre {a}-{b}",
+    "comprar {p} barato",
+    "O que é API?",
+    "Quem descobriu o Brasil?",
+    "qual a capital da França?",
+    "Me conte uma piada",
+    "manda os links dos produtos",
+    "Qual seu nome?",
+    "como está o clima hoje aí?",
+    "hmm deixa eu pensar melhor e te falo depois, valeu",
+]
+
+
+def messages(n: int, seed: int = 42) -> list[str]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        a = rnd.randint(20, 500)
+        out.append(rnd.choice(TEMPLATES).format(
+            p=rnd.choice(PRODUTOS), m=rnd.choice(MARCAS),
+            a=a, b=a + rnd.randint(10, 800),
+        ))
+    return out
+
+
+def senders(n: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    return [f"55{rnd.randint(11, 99)}9{rnd.randint(10_000_000, 99_999_999)}" for _ in range(n)]
+
+
+def catalog(n: int, seed: int = 3) -> list[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        price = f"{rnd.uniform(5, 3000):.2f}"
+        if rnd.random() < 0.3:
+            price = price.replace(".", ",")
+        out.append({
+            "product_title":          f"{rnd.choice(PRODUTOS).title()} {rnd.choice(MARCAS)} {i}",
+            "target_sale_price":      price,
+            "product_main_image_url": f"https://img.example.com/{i}.webp",
+            "promotion_link":         f"https://s.click.example.com/e/{i}",
+            "source":                 rnd.choice(["AliExpress", "MercadoLivre"]),
+        })
+    return out
+
+
+def webhook_payloads(n: int, seed: int = 11) -> list[dict]:
+    rnd = random.Random(seed)
+    sids = senders(n, seed)
+    msgs = messages(n, seed)
+    out = []
+    for sid, body in zip(sids, msgs):
+        value = {
+            "messaging_product": "whatsapp",
+            "metadata": {"display_phone_number": "5511900000000", "phone_number_id": "1234567890"},
+            "contacts": [{"profile": {"name": "Cliente"}, "wa_id": sid}],
+        }
+        if rnd.random() < 0.2:
+            value["interactive"] = {"type": "list_reply",
+                                    "list_reply": {"id": f"prod_{rnd.randint(1, 3)}", "title": "Item"}}
+        else:
+            value["messages"] = [{"from": sid, "id": f"wamid.{rnd.getrandbits(64):x}",
+                                  "timestamp": "1760000000", "type": "text", "text": {"body": body}}]
+        out.append({"object": "whatsapp_business_account",
+                    "entry": [{"id": "WABA", "changes": [{"field": "messages", "value": value}]}]})
+    return out
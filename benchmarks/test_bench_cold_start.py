@@ -0,0 +1,16 @@
+# benchmarks/test_bench_cold_start.py
+#
+# Tempo para um processo novo importar app.py (ZafiraCore incluso), como um
+# worker sem --preload ou uma instância nova subindo num pico de tráfego.
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_bench_cold_start_import_app(bench):
+    cmd = [sys.executable, "-c", "import app"]
+    bench(lambda: subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True),
+          repeat=3, min_time=0)
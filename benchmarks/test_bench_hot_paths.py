@@ -0,0 +1,101 @@
+# benchmarks/test_bench_hot_paths.py
+
+import pytest
+
+from datagen import messages, senders, catalog, webhook_payloads
+
+from agents.agente_conversa_geral import AgenteConversaGeral
+from agents.agente_conhecimento import AgenteConhecimento
+from agents.message_normalizer import normalize
+from agents.session_manager import SessionManager
+from clients.aliexpress_client import AliExpressClient
+from clients.mercado_livre_client import MercadoLivreClient
+from zafira_core import ZafiraCore
+
+MSGS = messages(1_000)
+
+
+@pytest.fixture(scope="module")
+def core():
+    return ZafiraCore()
+
+
+def test_bench_detect_intent(bench, core):
+    bench(lambda: [core._detect_intent(m) for m in MSGS])
+
+
+def test_bench_conversa_geral(bench):
+    agente = AgenteConversaGeral()
+    bench(lambda: [agente.responder(m) for m in MSGS])
+
+
+def test_bench_conhecimento(bench):
+    agente = AgenteConhecimento()
+    bench(lambda: [agente.responder(m) for m in MSGS])
+
+
+def test_bench_normalize(bench):
+    bench(lambda: [normalize(m).folded for m in MSGS])
+
+
+def test_bench_rota_completa(bench, core):
+    """Texto cru -> normalize -> intent -> agente, como em process_message."""
+    conv, conh = AgenteConversaGeral(), AgenteConhecimento()
+    agentes = {"conversa_geral": conv.responder, "informacao_geral": conh.responder}
+
+    def run():
+        for m in MSGS:
+            msg = normalize(m)
+            responder = agentes.get(core._detect_intent(msg))
+            if responder is not None:
+                responder(msg)
+
+    bench(run)
+
+
+def test_bench_session_manager(bench):
+    sids = senders(5_000)
+    sm = SessionManager(max_len=50)
+
+    def run():
+        for i, sid in enumerate(sids):
+            sm.push(sid, MSGS[i % len(MSGS)])
+            sm.get(sid)
+
+    bench(run)
+
+
+def test_bench_preco_filtro_ordenacao(bench, core):
+    produtos = catalog(2_000)
+
+    def run():
+        for m in MSGS[:200]:
+            min_p, max_p = normalize(m).price_range
+            core._filter_and_sort(produtos, min_p, max_p)[:3]
+
+    bench(run)
+
+
+def test_bench_ml_affiliate_link(bench):
+    ml = MercadoLivreClient()
+    ml.affiliate_id, ml.social_tool, ml.social_ref = "zafira123", "ferramenta", "ref-zafira"
+    links = [p["promotion_link"] for p in catalog(1_000)]
+    bench(lambda: [ml._make_affiliate_link(l, "fone bluetooth até 200") for l in links])
+
+
+def test_bench_aliexpress_sign(bench):
+    ae = AliExpressClient()
+    ae.app_secret = "s3cr3t"
+    params = [{
+        "app_key": "123456", "method": "aliexpress.affiliate.product.query",
+        "sign_method": "md5", "timestamp": "2026-10-19 12:00:00", "keywords": m,
+        "tracking_id": "zafira", "page_size": 10, "page_no": 1, "target_language": "pt",
+        "target_currency": "BRL", "ship_to_country": "BR",
+    } for m in MSGS[:500]]
+    bench(lambda: [ae._make_sign(p) for p in params])
+
+
+def test_bench_webhook_extract(bench):
+    from app import _extract_message
+    payloads = webhook_payloads(1_000)
+    bench(lambda: [_extract_message(p) for p in payloads])
@@ -3,6 +3,8 @@ import logging
 import requests
 from datetime import datetime
 
+from clients.deadline import timeout_for
+
 logger = logging.getLogger(__name__)
 
 class AliExpressClient:
@@ -17,11 +19,14 @@ class AliExpressClient:
 
         logger.info("Cliente AliExpress inicializado.")
 
-    def search_products(self, keywords: str, limit: int = 5, page_no: int = 1) -> dict:
+    def search_products(self, keywords: str, limit: int = 5, page_no: int = 1,
+                        deadline=None, reserve: float = 0.0) -> dict:
         """
         Faz a query de afiliados, sempre na página 1 por padrão,
-        e retorna o JSON da resposta.
+        e retorna o JSON da resposta. Com `deadline`, o timeout é limitado
+        ao tempo restante menos `reserve` (DeadlineExceeded se não sobrar).
         """
+        timeout = timeout_for(deadline, 15, reserve)
         # Timestamp no formato YYYY-MM-DD HH:MM:SS
         ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -42,7 +47,7 @@ class AliExpressClient:
         params["sign"] = self._make_sign(params)
 
         try:
-            resp = requests.get(self.base_url, params=params, timeout=15)
+            resp = requests.get(self.base_url, params=params, timeout=timeout)
             logger.info("AliExpress URL: %s", resp.url)
             logger.info("AliExpress BODY: %s", resp.text)
 
@@ -0,0 +1,46 @@
+# clients/deadline.py
+
+import time
+
+# Abaixo disso não vale a pena abrir uma chamada de rede
+MIN_TIMEOUT = 0.1
+
+
+class DeadlineExceeded(Exception):
+    """O orçamento de tempo da mensagem acabou antes da chamada."""
+
+
+class Deadline:
+    """
+    Orçamento de tempo de uma mensagem, criado em process_message e
+    repassado aos handlers e clientes. Cada chamada externa usa como
+    timeout o menor entre o seu limite próprio e o tempo que resta.
+    """
+    def __init__(self, budget: float):
+        self.budget     = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= MIN_TIMEOUT
+
+    def timeout(self, cap: float, reserve: float = 0.0) -> float:
+        """
+        Timeout para uma chamada limitada a `cap` segundos, deixando
+        `reserve` segundos livres (ex.: para ainda enviar a resposta).
+        Levanta DeadlineExceeded se não sobrar tempo útil.
+        """
+        t = min(cap, self.remaining() - reserve)
+        if t < MIN_TIMEOUT:
+            raise DeadlineExceeded(f"orçamento de {self.budget:.0f}s esgotado")
+        return t
+
+
+def timeout_for(deadline: Deadline | None, cap: float, reserve: float = 0.0) -> float:
+    """Timeout da chamada: `cap` sem deadline, senão limitado pelo que resta."""
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap, reserve)
@@ -2,6 +2,8 @@ import os
 import logging
 import requests
 
+from clients.deadline import timeout_for
+
 logger = logging.getLogger(__name__)
 
 class GROCClient:
@@ -16,11 +18,12 @@ class GROCClient:
         else:
             logger.info("Cliente GROC inicializado.")
 
-    def search_items(self, query: str, limit: int = 5) -> dict:
+    def search_items(self, query: str, limit: int = 5, deadline=None, reserve: float = 0.0) -> dict:
+        timeout = timeout_for(deadline, 20, reserve)
         headers = {"Authorization": f"Bearer {self.api_key}"}
         params  = {"q": query, "limit": limit}
         try:
-            resp = requests.get(f"{self.base_url}/search", headers=headers, params=params, timeout=20)
+            resp = requests.get(f"{self.base_url}/search", headers=headers, params=params, timeout=timeout)
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
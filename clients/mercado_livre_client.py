@@ -5,6 +5,8 @@ import requests
 import logging
 from urllib.parse import quote_plus
 
+from clients.deadline import timeout_for
+
 logger = logging.getLogger(__name__)
 
 class MercadoLivreClient:
@@ -34,10 +36,12 @@ class MercadoLivreClient:
             )
         return link
 
-    def search_products(self, query: str, limit: int = 10, offset: int = 0):
-        params = {"q": query, "limit": limit, "offset": offset}
+    def search_products(self, query: str, limit: int = 10, offset: int = 0,
+                        deadline=None, reserve: float = 0.0):
+        timeout = timeout_for(deadline, 10, reserve)
+        params  = {"q": query, "limit": limit, "offset": offset}
         try:
-            resp = requests.get(self.base_url, params=params, timeout=10)
+            resp = requests.get(self.base_url, params=params, timeout=timeout)
             resp.raise_for_status()
             items = resp.json().get("results", [])
         except Exception as e:
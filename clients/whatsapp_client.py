@@ -1,58 +1,223 @@
 import os
+import time
 import requests
 import logging
+import threading
+from collections import OrderedDict, deque
+
+from clients.deadline import timeout_for
+from agents.rate_limiter import RateGate
 
 logger = logging.getLogger(__name__)
 
+# Códigos de erro da Graph API que indicam limite de vazão do número
+THROTTLE_ERROR_CODES = {4, 80007, 130429}
+
+
+class PhoneNumber:
+    """
+    Um número do WhatsApp Business do pool, com suas métricas de envio.
+    `gate` limita os envios proativos a `rate` mensagens/s neste número.
+    """
+
+    RATE_WINDOW = 60.0     # janela (s) para calcular a vazão recente
+    COOLDOWN    = 10.0     # pausa (s) em envios proativos após throttling
+
+    def __init__(self, phone_number_id: str, token: str, rate: float = 80.0):
+        self.phone_number_id = phone_number_id
+        self.token           = token
+        self.gate            = RateGate(rate)
+        self.sent            = 0
+        self.errors          = 0
+        self.error_rate      = 0.0   # média móvel exponencial de falhas
+        self.cooldown_until  = 0.0
+        self._recent         = deque()   # instantes dos últimos envios
+        self._lock           = threading.Lock()
+
+    def record(self, ok: bool, throttled: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            self._recent.append(now)
+            self._trim(now)
+            if ok:
+                self.sent += 1
+            else:
+                self.errors += 1
+            self.error_rate = 0.9 * self.error_rate + (0.0 if ok else 0.1)
+            if throttled:
+                self.cooldown_until = now + self.COOLDOWN
+
+    def _trim(self, now: float):
+        while self._recent and now - self._recent[0] > self.RATE_WINDOW:
+            self._recent.popleft()
+
+    def rate(self) -> float:
+        """Envios por segundo no último minuto."""
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._recent) / self.RATE_WINDOW
+
+    @property
+    def cooling(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def load(self) -> float:
+        """Quanto menor, melhor candidato para tráfego proativo."""
+        return self.rate() * (1 + 4 * self.error_rate)
+
+    def stats(self) -> dict:
+        return {
+            "phone_number_id": self.phone_number_id,
+            "sent":            self.sent,
+            "errors":          self.errors,
+            "rate_per_s":      round(self.rate(), 2),
+            "error_rate":      round(self.error_rate, 3),
+            "cooling":         self.cooling,
+        }
+
+
 class WhatsAppClient:
-    """Cliente para interagir com a API do WhatsApp Cloud."""
+    """
+    Cliente para interagir com a API do WhatsApp Cloud.
 
-    def __init__(self):
+    Aceita um pool de números (WHATSAPP_PHONE_NUMBER_IDS, separados por
+    vírgula, com WHATSAPP_TOKENS na mesma ordem ou um WHATSAPP_TOKEN único).
+    Respostas saem pelo número em que o usuário escreveu (pin); envios
+    proativos (broadcast) vão para o número menos carregado e saudável que
+    ainda tenha vazão: cada número respeita BROADCAST_RATE mensagens/s.
+    """
+
+    def __init__(self, max_pins: int = 100_000):
         self.api_url = "https://graph.facebook.com/v20.0/"
-        self.token = os.getenv("WHATSAPP_TOKEN")
-        self.phone_number_id = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+        ids    = _split_env("WHATSAPP_PHONE_NUMBER_IDS") or _split_env("WHATSAPP_PHONE_NUMBER_ID")
+        tokens = _split_env("WHATSAPP_TOKENS") or _split_env("WHATSAPP_TOKEN")
+        ids = ids or [None]
+        if len(tokens) == 1:
+            tokens = tokens * len(ids)
 
-        if not all([self.token, self.phone_number_id]):
+        if ids[0] is None or len(tokens) != len(ids):
             logger.error("Credenciais do WhatsApp não configuradas!")
+            tokens = (tokens + [None] * len(ids))[:len(ids)]
         else:
-            logger.info("Cliente WhatsApp inicializado com sucesso")
+            logger.info(f"Cliente WhatsApp inicializado com sucesso ({len(ids)} número(s))")
+
+        rate = float(os.getenv("BROADCAST_RATE", "80"))
+        self.numbers = [PhoneNumber(i, t, rate) for i, t in zip(ids, tokens)]
+        self._by_id  = {n.phone_number_id: n for n in self.numbers}
+        # Compatibilidade: primeiro número do pool
+        self.token           = self.numbers[0].token
+        self.phone_number_id = self.numbers[0].phone_number_id
+
+        self._pins     = OrderedDict()   # { recipient_id: phone_number_id }, LRU
+        self._max_pins = max_pins
+        self._pins_lock = threading.Lock()
+
+    # ------------------------------------------------------------- roteamento
+
+    def pin(self, recipient_id: str, phone_number_id: str):
+        """Fixa a conversa no número em que o usuário escreveu."""
+        if phone_number_id not in self._by_id:
+            return
+        with self._pins_lock:
+            self._pins[recipient_id] = phone_number_id
+            self._pins.move_to_end(recipient_id)
+            if len(self._pins) > self._max_pins:
+                self._pins.popitem(last=False)
+
+    def _pick(self, recipient_id: str, proactive: bool) -> PhoneNumber:
+        if proactive:
+            return self._acquire_proactive(recipient_id)
+        if len(self.numbers) == 1:
+            return self.numbers[0]
+        pinned = self._pins.get(recipient_id)
+        if pinned is not None:
+            return self._by_id[pinned]
+        return min(self._healthy(), key=lambda n: n.load())
+
+    def _healthy(self) -> list[PhoneNumber]:
+        return [n for n in self.numbers if not n.cooling] or \
+            [min(self.numbers, key=lambda n: n.cooldown_until)]
 
-    def _headers(self):
+    def _acquire_proactive(self, recipient_id: str) -> PhoneNumber:
+        """
+        Reserva um envio proativo. Quem já escreveu para um número recebe por
+        ele (outro número estaria fora da janela de atendimento e a mensagem
+        falharia), esperando o token se preciso; só se o número fixado está
+        pausado o envio vai para outro.
+
+        Os demais vão para o número saudável menos carregado que ainda tem
+        token. Se todos estão no limite, espera o primeiro que liberar: um
+        número pausado nunca faz os outros passarem de BROADCAST_RATE.
+        """
+        pinned = self._pins.get(recipient_id)
+        if pinned is not None:
+            number = self._by_id[pinned]
+            if not number.cooling:
+                number.gate.acquire()
+                return number
+        while True:
+            candidates = sorted(self._healthy(), key=lambda n: n.load())
+            for number in candidates:
+                if number.gate.try_acquire():
+                    return number
+            time.sleep(min(n.gate.wait_time() for n in candidates))
+
+    def stats(self) -> list[dict]:
+        return [n.stats() for n in self.numbers]
+
+    # ------------------------------------------------------------------ envio
+
+    def _headers(self, token: str = None):
         return {
-            "Authorization": f"Bearer {self.token}",
+            "Authorization": f"Bearer {token or self.token}",
             "Content-Type": "application/json",
         }
 
-    def send_text_message(self, recipient_id: str, message: str) -> bool:
-        """Envia uma mensagem de texto."""
-        url = f"{self.api_url}{self.phone_number_id}/messages"
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": recipient_id,
-            "type": "text",
-            "text": {"body": message},
-        }
+    def _post(self, payload: dict, label: str, deadline=None, proactive: bool = False) -> bool:
+        """
+        Envia o payload pelo número escolhido no pool e registra o resultado.
+        `label` é usado nos logs ("Texto aceito", "Erro ao enviar lista"...).
+        """
+        timeout = timeout_for(deadline, 30)
+        number  = self._pick(payload["to"], proactive)
+        url     = f"{self.api_url}{number.phone_number_id}/messages"
         try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=30)
+            resp = requests.post(url, headers=self._headers(number.token), json=payload, timeout=timeout)
             data = resp.json()
             if resp.status_code == 200 and "messages" in data:
                 msg_id = data["messages"][0]["id"]
-                logger.info(f"Texto aceito com ID: {msg_id}")
+                logger.info(f"{label.capitalize()} aceito com ID: {msg_id}")
+                number.record(True)
                 return True
-            logger.error(f"Erro ao enviar texto: {resp.status_code} {resp.text}")
+            code = (data.get("error") or {}).get("code")
+            number.record(False, throttled=resp.status_code == 429 or code in THROTTLE_ERROR_CODES)
+            logger.error(f"Erro ao enviar {label}: {resp.status_code} {resp.text}")
         except Exception as e:
-            logger.error(f"Exceção ao enviar texto: {e}")
+            number.record(False)
+            logger.error(f"Exceção ao enviar {label}: {e}")
         return False
 
+    def send_text_message(self, recipient_id: str, message: str, deadline=None,
+                          proactive: bool = False) -> bool:
+        """Envia uma mensagem de texto."""
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": recipient_id,
+            "type": "text",
+            "text": {"body": message},
+        }
+        return self._post(payload, "texto", deadline, proactive)
+
     def send_media_message(
         self,
         recipient_id: str,
         media_url: str,
         caption: str = "",
-        media_type: str = "image"
+        media_type: str = "image",
+        deadline=None,
+        proactive: bool = False
     ) -> bool:
         """Envia imagem ou vídeo com legenda."""
-        url = f"{self.api_url}{self.phone_number_id}/messages"
         media_payload = {"link": media_url}
         if caption:
             media_payload["caption"] = caption
@@ -63,17 +228,7 @@ class WhatsAppClient:
             "type": media_type,
             media_type: media_payload,
         }
-        try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=30)
-            data = resp.json()
-            if resp.status_code == 200 and "messages" in data:
-                msg_id = data["messages"][0]["id"]
-                logger.info(f"{media_type.capitalize()} aceito com ID: {msg_id}")
-                return True
-            logger.error(f"Erro ao enviar {media_type}: {resp.status_code} {resp.text}")
-        except Exception as e:
-            logger.error(f"Exceção ao enviar {media_type}: {e}")
-        return False
+        return self._post(payload, media_type, deadline, proactive)
 
     def send_list_message(
         self,
@@ -82,10 +237,11 @@ class WhatsAppClient:
         body: str,
         footer: str,
         button: str,
-        sections: list
+        sections: list,
+        deadline=None,
+        proactive: bool = False
     ) -> bool:
         """Envia uma mensagem interativa do tipo lista."""
-        url = f"{self.api_url}{self.phone_number_id}/messages"
         payload = {
             "messaging_product": "whatsapp",
             "to": recipient_id,
@@ -98,14 +254,8 @@ class WhatsAppClient:
                 "action": {"button": button, "sections": sections}
             }
         }
-        try:
-            resp = requests.post(url, headers=self._headers(), json=payload, timeout=30)
-            data = resp.json()
-            if resp.status_code == 200 and "messages" in data:
-                msg_id = data["messages"][0]["id"]
-                logger.info(f"Lista aceita com ID: {msg_id}")
-                return True
-            logger.error(f"Erro ao enviar lista: {resp.status_code} {resp.text}")
-        except Exception as e:
-            logger.error(f"Exceção ao enviar lista: {e}")
-        return False
+        return self._post(payload, "lista", deadline, proactive)
+
+
+def _split_env(name: str) -> list[str]:
+    return [v.strip() for v in os.getenv(name, "").split(",") if v.strip()]
@@ -0,0 +1,43 @@
+# gunicorn.conf.py
+#
+# Uso: gunicorn -c gunicorn.conf.py app:app
+#
+# Workers gthread: cada worker atende várias requisições em threads, o que
+# esconde a espera de rede (AliExpress, Mercado Livre, Groq, Graph API).
+# ZafiraCore serializa apenas mensagens do mesmo sender (StripedLock).
+#
+# preload_app: o master importa app.py uma vez (padrões compilados, índice
+# de conhecimento, ZafiraCore) e os workers herdam tudo por copy-on-write.
+# Os clientes de rede são criados no primeiro uso, já dentro de cada worker,
+# e nenhuma thread é iniciada antes do fork.
+
+import gc
+import os
+
+import startup
+
+bind         = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gthread"
+workers      = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads      = int(os.getenv("GUNICORN_THREADS", "16"))
+timeout      = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app  = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    server.log.info(f"[STARTUP] master pronto, {startup.summary()}")
+
+
+def pre_fork(server, worker):
+    # Tira os objetos do master do GC: sem isso, cada coleta no worker
+    # escreve nos cabeçalhos dos objetos herdados e copia as páginas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    startup.mark_fork()
+
+
+def post_worker_init(worker):
+    startup.mark("worker_ready_ms")
+    worker.log.info(f"[STARTUP] worker pronto, {startup.summary()}")
@@ -0,0 +1,65 @@
+# startup.py
+#
+# Medidas de inicialização: quanto tempo o app leva para ficar pronto e
+# quanta memória cada processo ocupa. Importado primeiro em app.py, para que
+# o relógio comece antes dos imports pesados (Flask, ZafiraCore).
+#
+# Com `--preload`, o master carrega o app uma vez e os workers herdam as
+# páginas por copy-on-write: o RSS de cada worker conta essas páginas
+# compartilhadas, o PSS as divide entre os processos que as usam.
+
+import os
+import time
+import resource
+
+_T0     = time.perf_counter()
+_marks  = {}   # { nome: ms }
+_forked = None
+
+
+def mark(name: str) -> float:
+    """Registra `name` com os ms decorridos desde o início (ou desde o fork)."""
+    since = _forked if _forked is not None else _T0
+    _marks[name] = round((time.perf_counter() - since) * 1000, 1)
+    return _marks[name]
+
+
+def mark_fork():
+    """Chamado no worker logo após o fork; zera o relógio do worker."""
+    global _forked
+    _forked = time.perf_counter()
+
+
+def _proc_kb(path: str, field: str):
+    try:
+        with open(path, encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb() -> float:
+    kb = _proc_kb("/proc/self/status", "VmRSS:")
+    if kb is None:
+        # Fora do Linux: pico de RSS (KB no Linux, bytes no macOS)
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / 1024, 1)
+
+
+def pss_mb():
+    kb = _proc_kb("/proc/self/smaps_rollup", "Pss:")
+    return None if kb is None else round(kb / 1024, 1)
+
+
+def stats() -> dict:
+    return {"pid": os.getpid(), "rss_mb": rss_mb(), "pss_mb": pss_mb(), **_marks}
+
+
+def summary() -> str:
+    s = stats()
+    marks = " | ".join(f"{k} {v} ms" for k, v in _marks.items())
+    pss = f" (PSS {s['pss_mb']} MB)" if s["pss_mb"] is not None else ""
+    return f"pid {s['pid']}: {marks or 'sem marcas'} | RSS {s['rss_mb']} MB{pss}"
@@ -0,0 +1,64 @@
+# tests/conftest.py
+
+import threading
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _zafira_data_dir(tmp_path, monkeypatch):
+    """Snapshots e jobs gravados pelos testes vão para um diretório temporário."""
+    monkeypatch.setenv("ZAFIRA_DATA_DIR", str(tmp_path / "data"))
+
+
+class FakeWhatsApp:
+    """
+    Substituto do WhatsAppClient que só registra os envios em `sent`, como
+    (destinatário, tipo, conteúdo). Destinatários em `always_fail` sempre
+    falham; os em `flaky` falham só na primeira tentativa.
+    """
+    def __init__(self, flaky=(), always_fail=()):
+        self.flaky       = set(flaky)
+        self.always_fail = set(always_fail)
+        self.sent     = []
+        self.attempts = {}
+        self.numbers  = ["num-1"]
+        self._lock    = threading.Lock()
+
+    def _send(self, to, kind, content):
+        with self._lock:
+            self.attempts[to] = self.attempts.get(to, 0) + 1
+            if to in self.always_fail or (to in self.flaky and self.attempts[to] == 1):
+                return False
+            self.sent.append((to, kind, content))
+            return True
+
+    def send_text_message(self, to, text, **kwargs):
+        return self._send(to, "text", text)
+
+    def send_media_message(self, to, url, caption="", **kwargs):
+        return self._send(to, "image", (url, caption))
+
+    def send_list_message(self, to, header, body, footer, button, sections, **kwargs):
+        return self._send(to, "list", sections)
+
+    def pin(self, recipient_id, phone_number_id):
+        pass
+
+    def stats(self):
+        return []
+
+    @property
+    def last_text(self) -> str:
+        return next(c for _, kind, c in reversed(self.sent) if kind == "text")
+
+
+@pytest.fixture
+def make_whatsapp():
+    """Fábrica de FakeWhatsApp, para testes que precisam de mais de um."""
+    return FakeWhatsApp
+
+
+@pytest.fixture
+def whatsapp():
+    return FakeWhatsApp()
@@ -104,12 +104,12 @@ class DummyWhatsAppClient:
     def __init__(self):
         self.sent = []
 
-    def send_text_message(self, to, text):
+    def send_text_message(self, to, text, **kwargs):
         self.sent.append((to, text))
 
 # Mock de AliExpressClient
 class DummyAE:
-    def search_products(self, terms, limit, page_no):
+    def search_products(self, terms, limit, page_no, **kwargs):
         return {
             "aliexpress_affiliate_product_query_response": {
                 "resp_result": {
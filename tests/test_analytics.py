@@ -0,0 +1,111 @@
+# tests/test_analytics.py
+
+import json
+from datetime import datetime, timedelta
+
+from agents.analytics import HyperLogLog, CountMinSketch, UsageAnalytics
+from zafira_core import ZafiraCore
+
+# -----------------------------------------------------------------------------
+# Sketches
+# -----------------------------------------------------------------------------
+
+def test_hyperloglog_estimativa_e_merge():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(30_000):
+        a.add(f"user{i}")
+    for i in range(20_000, 50_000):
+        b.add(f"user{i}")
+    assert abs(a.count() - 30_000) / 30_000 < 0.05
+    a.merge(b)
+    assert abs(a.count() - 50_000) / 50_000 < 0.05
+    assert len(a.registers) == 4096
+
+
+def test_hyperloglog_poucos_itens():
+    h = HyperLogLog()
+    for sid in ["a", "b", "c", "a", "b"]:
+        h.add(sid)
+    assert h.count() == 3
+
+
+def test_count_min_nunca_subestima():
+    cms = CountMinSketch(width=256, depth=4)
+    for i in range(2_000):
+        cms.add(f"termo{i % 500}")
+    for i in range(500):
+        assert cms.estimate(f"termo{i}") >= 4
+
+# -----------------------------------------------------------------------------
+# UsageAnalytics
+# -----------------------------------------------------------------------------
+
+def test_usage_analytics_memoria_constante(tmp_path):
+    ua = UsageAnalytics(data_dir=str(tmp_path), keep_hours=3, keep_days=2, top_k=5)
+    start = datetime(2026, 10, 1)
+    for i in range(5_000):
+        ua.record_message(f"u{i}", "produto", now=start + timedelta(minutes=i))
+        ua.record_search(f"termo {i}")
+    assert len(ua.hours) == 3 and len(ua.days) == 2 and len(ua.intents) == 2
+    assert len(ua.top_searches) == 5
+
+
+def test_usage_analytics_merge_entre_workers(tmp_path):
+    now = datetime(2026, 10, 19, 12)
+    w1 = UsageAnalytics(data_dir=str(tmp_path))
+    w2 = UsageAnalytics(data_dir=str(tmp_path))
+    for i in range(100):
+        w1.record_message(f"u{i}", "produto", now=now)
+        w1.record_search("fone bluetooth")
+    for i in range(50, 150):
+        w2.record_message(f"u{i}", "saudacao", now=now)
+        if i % 2:
+            w2.record_search("tênis")
+    w2.record_impression()
+    w2.record_click(2)
+    w2.record_impression(broadcast=True)
+    w2.record_click(1, broadcast=True)
+    # Snapshot do "outro worker" gravado no disco
+    (tmp_path / "outro-123.json").write_text(json.dumps(w2.snapshot()))
+
+    r = w1.report()
+    assert abs(r["unique_by_day"]["2026-10-19"] - 150) <= 3
+    assert r["intents"]["2026-10-19"] == {"produto": 100, "saudacao": 100}
+    assert r["top_searches"][:2] == [("fone bluetooth", 100), ("tênis", 50)]
+    assert r["impressions"] == 1 and r["clicks"] == [0, 1, 0]
+    assert r["broadcast_impressions"] == 1 and r["broadcast_clicks"] == 1
+
+
+def test_usage_analytics_flush_periodico(tmp_path):
+    ua = UsageAnalytics(data_dir=str(tmp_path), flush_interval=0)
+    ua.record_message("u1", "piada")
+    files = list(tmp_path.glob("*.json"))
+    assert len(files) == 1
+    assert json.loads(files[0].read_text())["intents"]
+
+def test_usage_analytics_restart_com_mesmo_pid_nao_perde_snapshot(tmp_path):
+    # Após um restart o container repete hostname e pid do worker antigo
+    now = datetime(2026, 10, 19, 12)
+    antes = UsageAnalytics(data_dir=str(tmp_path))
+    antes.record_message("u1", "piada", now=now)
+    antes.flush()
+    depois = UsageAnalytics(data_dir=str(tmp_path))
+    depois.record_message("u2", "piada", now=now)
+    depois.flush()
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert depois.report()["intents"]["2026-10-19"] == {"piada": 2}
+
+# -----------------------------------------------------------------------------
+# Relatório ADM
+# -----------------------------------------------------------------------------
+
+def test_relatorio_adm_usa_analytics(whatsapp):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    for sid in ["u1", "u2", "u1"]:
+        z.process_message(sid, "me conte uma piada")
+    z.admin_sessions["adm"] = datetime.utcnow() + timedelta(minutes=30)
+    z.process_message("adm", "/relatorio")
+    report = z.whatsapp.last_text
+    assert "Usuários hoje: ~3" in report
+    assert "piada 3" in report
@@ -0,0 +1,199 @@
+# tests/test_broadcast.py
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from agents.audience import AudienceLog
+from agents.broadcast import BroadcastEngine, JobRunning
+from zafira_core import ZafiraCore
+
+
+# -----------------------------------------------------------------------------
+# BroadcastEngine
+# -----------------------------------------------------------------------------
+
+def test_broadcast_envia_todos_com_retry(tmp_path, make_whatsapp):
+    wa = make_whatsapp(flaky={"u3", "u7"}, always_fail={"u9"})
+    eng = BroadcastEngine(wa, data_dir=str(tmp_path), rate_per_sec=1000,
+                          workers=4, max_retries=2, backoff=0)
+    users = [f"u{i}" for i in range(20)]
+    job = eng.start(users, "text", {"body": "Oferta!"})
+    assert eng.wait(job.job_id, timeout=10)
+
+    p = eng.status(job.job_id)
+    assert (p["sent"], p["failed"], p["remaining"]) == (19, 1, 0)
+    assert wa.attempts["u3"] == 2 and wa.attempts["u9"] == 3
+    assert sorted(to for to, _, _ in wa.sent) == sorted(u for u in users if u != "u9")
+
+    log = (tmp_path / f"{job.job_id}.log").read_text().splitlines()
+    assert "fail\tu9" in log and len(log) == 20
+
+
+def test_broadcast_retoma_de_onde_parou(tmp_path, make_whatsapp):
+    wa = make_whatsapp()
+    eng = BroadcastEngine(wa, data_dir=str(tmp_path), rate_per_sec=1000, workers=2)
+    users = [f"u{i}" for i in range(10)]
+    job = eng.start(users, "image", {"url": "http://x/img.jpg", "caption": "Promo"})
+    eng.wait(job.job_id, timeout=10)
+
+    # Simula um restart no meio do job: metade do log se perdeu
+    log_path = tmp_path / f"{job.job_id}.log"
+    lines = log_path.read_text().splitlines()
+    log_path.write_text("\n".join(lines[:4]) + "\n")
+
+    wa2 = make_whatsapp()
+    eng2 = BroadcastEngine(wa2, data_dir=str(tmp_path), rate_per_sec=1000, workers=2)
+    job2 = eng2.resume(job.job_id)
+    eng2.wait(job2.job_id, timeout=10)
+
+    assert job2.skipped == 4
+    assert len(wa2.sent) == 6
+    assert eng2.status(job.job_id)["remaining"] == 0
+
+
+def test_broadcast_respeita_vazao(tmp_path, whatsapp):
+    wa = whatsapp
+    eng = BroadcastEngine(wa, data_dir=str(tmp_path), rate_per_sec=100, workers=8)
+    t0 = time.monotonic()
+    job = eng.start([f"u{i}" for i in range(130)], "text", {"body": "x"})
+    eng.wait(job.job_id, timeout=10)
+    # 100 de burst inicial + 30 a 100 msg/s
+    assert time.monotonic() - t0 >= 0.25
+    assert len(wa.sent) == 130
+
+def test_broadcast_visto_e_controlado_por_outro_worker(tmp_path, make_whatsapp):
+    # Dois engines no mesmo diretório simulam dois workers do gunicorn
+    wa = make_whatsapp()
+    owner = BroadcastEngine(wa, data_dir=str(tmp_path), rate_per_sec=20, workers=2)
+    other = BroadcastEngine(make_whatsapp(), data_dir=str(tmp_path))
+    job = owner.start([f"u{i}" for i in range(200)], "text", {"body": "x"})
+
+    assert other.is_running(job.job_id)
+    assert other.status()["job_id"] == job.job_id
+    with pytest.raises(JobRunning):
+        other.resume(job.job_id)
+
+    assert other.cancel(job.job_id)
+    assert owner.wait(job.job_id, timeout=5)
+    p = other.status(job.job_id)
+    assert not p["running"] and p["cancelled"]
+    assert p["sent"] == len(wa.sent) < 200
+
+    # Parado, pode ser retomado por qualquer worker
+    job2 = other.resume(job.job_id)
+    assert job2.skipped == p["sent"]
+    other.cancel(job.job_id)
+    other.wait(job.job_id, timeout=5)
+
+
+def test_audiencia_reune_senders_de_todos_os_workers(tmp_path):
+    w1 = AudienceLog(str(tmp_path), process_name="w1")
+    w2 = AudienceLog(str(tmp_path), process_name="w2")
+    w1.record("u1", "Quero FONE")
+    w2.record("u2", "oi")
+    w2.record("u1", "de novo")
+    assert w1.senders() == ["u1", "u2"]
+    assert w2.senders("fone") == ["u1"]
+
+
+def test_audiencia_guarda_so_termos_sem_acento(tmp_path):
+    log = AudienceLog(str(tmp_path), process_name="w1")
+    log.record("u1", "Quero um relógio, meu CPF é 12345678900")
+    log.record("u2", "procuro relogio barato")
+    assert log.senders("relógio") == log.senders("relogio") == ["u1", "u2"]
+    stored = "".join(p.read_text(encoding="utf-8") for p in tmp_path.glob("*/*.log"))
+    assert stored == "u1\tum relogio meu cpf e\nu2\trelogio barato\n"
+
+# -----------------------------------------------------------------------------
+# Comandos ADM
+# -----------------------------------------------------------------------------
+
+def _admin_core(tmp_path, monkeypatch, whatsapp):
+    monkeypatch.setenv("ZAFIRA_DATA_DIR", str(tmp_path))
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.admin_sessions["adm"] = datetime.utcnow() + timedelta(minutes=30)
+    for sid, msg in [("u1", "quero fone"), ("u2", "quero tenis"), ("u3", "oi")]:
+        z.audience.record(sid, msg)
+    return z
+
+
+def test_core_broadcast_texto_com_filtro(tmp_path, monkeypatch, whatsapp):
+    z = _admin_core(tmp_path, monkeypatch, whatsapp)
+    z.process_message("adm", "/broadcast filtro=fone Fone com 50% off!")
+    job_id = z.broadcast.status()["job_id"]
+    z.broadcast.wait(job_id, timeout=10)
+
+    offers = [(to, body) for to, kind, body in z.whatsapp.sent if kind == "text" and to != "adm"]
+    assert offers == [("u1", "Fone com 50% off!")]
+
+    z.process_message("adm", "/broadcast status")
+    assert "Enviados: 1/1" in z.whatsapp.sent[-1][2]
+
+
+def test_core_filtro_ignora_acento(tmp_path, monkeypatch, whatsapp):
+    z = _admin_core(tmp_path, monkeypatch, whatsapp)
+    z.process_message("adm", "/broadcast filtro=Tênis Promoção de tênis!")
+    z.broadcast.wait(z.broadcast.status()["job_id"], timeout=10)
+    offers = [to for to, kind, body in z.whatsapp.sent if kind == "text" and to != "adm"]
+    assert offers == ["u2"]
+
+
+def test_core_broadcast_lista_resolve_selecao(tmp_path, monkeypatch, whatsapp):
+    z = _admin_core(tmp_path, monkeypatch, whatsapp)
+    z._last_search.put("adm", ("fone", [
+        {"product_title": "Fone X", "target_sale_price": "99.90", "promotion_link": "http://fone"},
+    ]))
+    z.process_message("adm", "/broadcast lista")
+    job_id = z.broadcast.status()["job_id"]
+    z.broadcast.wait(job_id, timeout=10)
+
+    row_id = next(sections[0]["rows"][0]["id"]
+                  for to, kind, sections in z.whatsapp.sent if kind == "list" and to == "u1")
+    z.process_message("u1", row_id, interactive={"type": "list_reply", "list_reply": {"id": row_id}})
+    assert z.whatsapp.sent[-1][0] == "u1"
+    assert "http://fone" in z.whatsapp.sent[-1][2][1]
+
+    # Cliques em ofertas contam contra as listas entregues, não contra as buscas
+    r = z.analytics.report()
+    assert (r["broadcast_clicks"], r["broadcast_impressions"]) == (1, 3)
+    assert (sum(r["clicks"]), r["impressions"]) == (0, 0)
+
+
+def test_core_status_e_cancelamento_de_outro_worker(tmp_path, monkeypatch, make_whatsapp):
+    z1 = _admin_core(tmp_path, monkeypatch, make_whatsapp())
+    z2 = _admin_core(tmp_path, monkeypatch, make_whatsapp())
+    monkeypatch.setenv("BROADCAST_MAX_RATE", "1")   # lento o bastante para cancelar
+    z1.audience.record("u4", "oi")              # usuário que só passou pelo worker 1
+    z1.process_message("adm", "/broadcast Promo!")
+    job_id = z1.broadcast.status()["job_id"]
+
+    z2.process_message("adm", "/broadcast status")
+    assert f"Broadcast {job_id} (em andamento)" in z2.whatsapp.last_text
+    assert "/4" in z2.whatsapp.last_text
+    z2.process_message("adm", f"/broadcast retomar {job_id}")
+    assert "já está rodando" in z2.whatsapp.last_text
+    z2.process_message("adm", f"/broadcast cancelar {job_id}")
+    assert z2.whatsapp.last_text == "⏹️ Job cancelado."
+    assert z1.broadcast.wait(job_id, timeout=5)
+
+
+@pytest.mark.parametrize("choice_id", ["oferta_a_b_1", "oferta__1", "prod_x", "prod", "oferta_../x_1", "qualquer"])
+def test_core_selecao_com_id_invalido(tmp_path, monkeypatch, whatsapp, choice_id):
+    z = _admin_core(tmp_path, monkeypatch, whatsapp)
+    z.process_message("u1", choice_id, interactive={"type": "list_reply", "list_reply": {"id": choice_id}})
+    assert z.whatsapp.sent[-1] == ("u1", "text", "Opção inválida.")
+
+
+def test_extra_gravado_a_parte_e_em_cache(tmp_path, whatsapp, monkeypatch):
+    eng = BroadcastEngine(whatsapp, data_dir=str(tmp_path), rate_per_sec=1000)
+    job = eng.start(["u1"], "text", {"body": "x"}, extra={"products": [{"product_title": "A"}]})
+    eng.wait(job.job_id, timeout=5)
+    assert "extra" not in (tmp_path / f"{job.job_id}.json").read_text()
+
+    assert eng.extra(job.job_id)["products"][0]["product_title"] == "A"
+    monkeypatch.setattr(eng, "_read_json", lambda path: pytest.fail("extra deveria vir do cache"))
+    assert eng.extra(job.job_id)["products"][0]["product_title"] == "A"
+    assert BroadcastEngine(whatsapp, data_dir=str(tmp_path)).extra("naoexiste") == {}
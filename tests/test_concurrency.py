@@ -0,0 +1,144 @@
+# tests/test_concurrency.py
+
+import threading
+import time
+
+from agents.rate_limiter import SenderRateLimiter
+from agents.session_manager import SessionManager
+from agents.striped_lock import StripedLock
+from agents.lru_cache import LRUCache
+from zafira_core import ZafiraCore
+
+# -----------------------------------------------------------------------------
+# StripedLock / SessionManager sob contenção
+# -----------------------------------------------------------------------------
+
+def test_striped_lock_mesma_chave_mesmo_lock():
+    locks = StripedLock(8)
+    assert locks.lock_for("5511999") is locks.lock_for("5511999")
+    assert len(locks) == 8
+
+
+def test_session_manager_sem_updates_perdidos():
+    n_threads, n_msgs, senders = 32, 500, ["a", "b", "c", "d"]
+    sm = SessionManager(max_len=n_threads * n_msgs, stripes=2)
+    start = threading.Barrier(n_threads)
+
+    def worker(t):
+        start.wait()
+        sid = senders[t % len(senders)]
+        for i in range(n_msgs):
+            sm.push(sid, f"{t}:{i}")
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    per_sender = n_threads // len(senders) * n_msgs
+    for sid in senders:
+        hist = sm.get(sid)
+        assert len(hist) == per_sender
+        # As mensagens de cada thread preservam a ordem de envio
+        seen = {}
+        for entry in hist:
+            t, i = map(int, entry.split(":"))
+            assert i == seen.get(t, -1) + 1
+            seen[t] = i
+
+# -----------------------------------------------------------------------------
+# ZafiraCore: serialização por sender, paralelismo entre senders
+# -----------------------------------------------------------------------------
+
+class TrackingAgent:
+    """Conta quantas respostas estão em execução ao mesmo tempo."""
+    def __init__(self, barrier=None):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.barrier = barrier
+
+    def responder(self, texto):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        if self.barrier is not None:
+            self.barrier.wait()
+        else:
+            time.sleep(0.002)
+        with self.lock:
+            self.active -= 1
+        return "ok"
+
+
+def _core_with(agent, whatsapp):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.ag_conv = agent
+    z.rate_limiter = SenderRateLimiter(per_minute=1e9, burst=1e9)
+    return z
+
+
+def test_zafira_core_serializa_mesmo_sender(whatsapp):
+    agent = TrackingAgent()
+    z = _core_with(agent, whatsapp)
+    n_threads, n_msgs = 16, 20
+
+    def worker():
+        for _ in range(n_msgs):
+            z.process_message("mesmo", "blablabla")
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert agent.max_active == 1
+    assert len(z.whatsapp.sent) == n_threads * n_msgs
+    assert len(z.sessions.get("mesmo")) == z.sessions.max_len
+
+
+def test_zafira_core_senders_distintos_em_paralelo(whatsapp):
+    # Se os dois senders fossem serializados, a barreira estouraria o timeout
+    agent = TrackingAgent(barrier=threading.Barrier(2, timeout=5))
+    z = _core_with(agent, whatsapp)
+    a = "user-a"
+    b = next(f"user-{i}" for i in range(1000)
+             if z._sender_locks.lock_for(f"user-{i}") is not z._sender_locks.lock_for(a))
+
+    errors = []
+
+    def worker(sid):
+        try:
+            z.process_message(sid, "blablabla")
+        except Exception as e:  # pragma: no cover - só em caso de falha
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(sid,)) for sid in (a, b)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert not errors
+    assert len(z.whatsapp.sent) == 2
+
+
+def test_lru_cache_descarta_o_menos_recente():
+    cache = LRUCache(max_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1      # "a" passa a ser o mais recente
+    cache.put("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_zafira_core_ultima_busca_limitada(monkeypatch):
+    monkeypatch.setenv("LAST_SEARCH_MAX", "3")
+    z = ZafiraCore()
+    for i in range(10):
+        z._last_search.put(f"u{i}", ("fone", [{}]))
+    assert len(z._last_search) == 3
@@ -0,0 +1,107 @@
+# tests/test_deadline.py
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from clients.deadline import Deadline, DeadlineExceeded, timeout_for
+from clients.aliexpress_client import AliExpressClient
+from zafira_core import ZafiraCore, TIMEOUT_REPLY
+
+# -----------------------------------------------------------------------------
+# Deadline
+# -----------------------------------------------------------------------------
+
+def test_timeout_limitado_pelo_orcamento():
+    d = Deadline(2.0)
+    assert d.timeout(30) <= 2.0
+    assert d.timeout(0.5) == 0.5
+    assert d.timeout(30, reserve=1.0) <= 1.0
+    with pytest.raises(DeadlineExceeded):
+        d.timeout(30, reserve=2.0)
+
+
+def test_timeout_for_sem_deadline_usa_o_limite():
+    assert timeout_for(None, 15) == 15
+
+
+def test_aliexpress_usa_tempo_restante(monkeypatch):
+    captured = {}
+
+    class Resp:
+        url, text = "http://x", "{}"
+        def raise_for_status(self): pass
+        def json(self): return {}
+
+    def fake_get(url, params=None, timeout=None):
+        captured["timeout"] = timeout
+        return Resp()
+
+    monkeypatch.setattr("clients.aliexpress_client.requests.get", fake_get)
+    AliExpressClient().search_products("fone", deadline=Deadline(5.0), reserve=2.0)
+    assert 0 < captured["timeout"] <= 3.0
+
+# -----------------------------------------------------------------------------
+# ZafiraCore: orçamento por mensagem
+# -----------------------------------------------------------------------------
+
+class SlowAE:
+    """Consome o orçamento e devolve produtos no formato da API."""
+    def __init__(self, delay):
+        self.delay = delay
+
+    def search_products(self, terms, limit, page_no, deadline=None, reserve=0.0):
+        timeout_for(deadline, 15, reserve)
+        time.sleep(self.delay)
+        products = [{"product_title": "Fone AE", "target_sale_price": "50.00", "promotion_link": "ae"}]
+        return {"aliexpress_affiliate_product_query_response":
+                {"resp_result": {"result": {"products": {"product": products}}}}}
+
+
+class FakeML:
+    def __init__(self):
+        self.calls = 0
+
+    def search_products(self, query, limit, deadline=None, reserve=0.0):
+        timeout_for(deadline, 10, reserve)
+        self.calls += 1
+        return [{"product_title": "Fone ML", "target_sale_price": "40.00", "source": "MercadoLivre"}]
+
+
+def _core(budget, reserve, whatsapp):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.message_budget, z.reply_reserve = budget, reserve
+    return z
+
+
+def test_busca_envia_resultado_parcial_quando_o_tempo_acaba(whatsapp):
+    z = _core(budget=0.6, reserve=0.3, whatsapp=whatsapp)
+    z.aliexpress, z.mercado = SlowAE(delay=0.35), FakeML()
+    z.process_message("u1", "quero um fone")
+
+    assert z.mercado.calls == 0
+    to, kind, sections = z.whatsapp.sent[-1]
+    assert kind == "list"
+    assert [r["title"] for r in sections[0]["rows"]] == ["Fone AE — R$50.00 (Al..."]
+
+
+def test_busca_sem_tempo_responde_fallback(whatsapp):
+    z = _core(budget=0.35, reserve=0.3, whatsapp=whatsapp)
+    # Orçamento útil (0,05s) < MIN_TIMEOUT: nenhuma busca chega a acontecer
+    z.aliexpress, z.mercado = SlowAE(delay=0), FakeML()
+    z.process_message("u1", "quero um fone")
+    assert z.whatsapp.sent[-1] == ("u1", "text", TIMEOUT_REPLY)
+
+
+def test_adm_groq_estourando_orcamento(whatsapp):
+    class SlowGroq:
+        def responder(self, history, message, deadline=None, reserve=0.0):
+            raise DeadlineExceeded("Groq lento")
+
+    z = _core(budget=5, reserve=1, whatsapp=whatsapp)
+    z.ag_adm_groq = SlowGroq()
+    z.admin_sessions["adm"] = datetime.utcnow() + timedelta(minutes=30)
+    z.process_message("adm", "como estão as vendas?")
+    assert z.whatsapp.sent[-1] == ("adm", "text", TIMEOUT_REPLY)
@@ -0,0 +1,64 @@
+# tests/test_message_normalizer.py
+
+import re
+import unicodedata
+
+import pytest
+
+from agents.message_normalizer import normalize, fold, NormalizedMessage
+from agents.agente_conversa_geral import AgenteConversaGeral
+from agents.agente_conhecimento import AgenteConhecimento
+from zafira_core import ZafiraCore
+
+
+def test_fold_remove_acentos():
+    assert fold("Olá, câmera até ação") == "Ola, camera ate acao"
+
+
+def test_fold_latin1_igual_ao_nfkd():
+    # A tabela de bytes precisa dar o mesmo resultado do caminho NFKD
+    latin1 = "".join(map(chr, range(0xA0, 0x100)))
+    esperado = re.sub(r"[\u0300-\u036f]", "", unicodedata.normalize("NFKD", latin1))
+    assert "".join(fold(c) for c in latin1) == esperado
+    assert fold("ÁGUA 😊 ½ µ") == "AGUA 😊 1⁄2 μ"
+
+
+def test_normalized_message_campos():
+    m = normalize("Quero uma  Câmera   até 150,50 reais!")
+    assert m.folded == "quero uma camera ate 150,50 reais!"
+    assert m.clean == "quero uma camera ate 15050 reais"
+    assert m.terms == ["uma", "câmera", "15050"]
+    assert m.numbers == [150.5]
+    assert m.price_range == (None, 150.5)
+    assert normalize(m) is m
+
+
+@pytest.mark.parametrize("texto,faixa", [
+    ("fone de 100 até 200", (100.0, 200.0)),
+    ("tênis 50-80", (50.0, 80.0)),
+    ("mouse ate 99,90", (None, 99.9)),
+    ("chocolate 50 gramas", (None, None)),
+])
+def test_price_range(texto, faixa):
+    assert normalize(texto).price_range == faixa
+
+
+def test_agentes_aceitam_mensagem_normalizada():
+    m = NormalizedMessage("Quem é você?")
+    assert AgenteConversaGeral().responder(m) == "Eu sou a Zafira, sua assistente de compras e conversa!"
+    assert AgenteConhecimento().responder(normalize("capital da franca")) == "Paris"
+
+
+@pytest.mark.parametrize("texto,intent", [
+    ("Olá!", "saudacao"),
+    ("modo adm", "modo_admin"),
+    ("manda o relatório", "relatorio"),
+    ("O que é API?", "informacao_geral"),
+    ("sei o que eu quero: fone", "produto"),
+    ("quero um fone até 100", "produto"),
+    ("me manda os links", "links"),
+    ("conta uma piada", "piada"),
+    ("hmm", "conversa_geral"),
+])
+def test_detect_intent(texto, intent):
+    assert ZafiraCore()._detect_intent(texto) == intent
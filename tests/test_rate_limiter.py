@@ -0,0 +1,196 @@
+# tests/test_rate_limiter.py
+
+import runpy
+import threading
+import time
+from pathlib import Path
+
+from agents.rate_limiter import (
+    TokenBucket, SenderRateLimiter, LoadShedder,
+    LOAD_OK, LOAD_SHED_EXPENSIVE, LOAD_SHED_ALL,
+)
+from zafira_core import ZafiraCore, OVERLOAD_REPLY
+
+# -----------------------------------------------------------------------------
+# TokenBucket / SenderRateLimiter
+# -----------------------------------------------------------------------------
+
+def test_token_bucket_refill():
+    b = TokenBucket(rate=1.0, capacity=2, now=0.0)
+    assert b.try_acquire(now=0.0)
+    assert b.try_acquire(now=0.0)
+    assert not b.try_acquire(now=0.0)
+    assert b.wait_time(now=0.0) == 1.0
+    assert b.try_acquire(now=1.0)
+
+
+def test_sender_rate_limiter_limita_so_o_sender_abusivo():
+    rl = SenderRateLimiter(per_minute=1, burst=3)
+    assert [rl.allow("spam") for _ in range(5)] == [True, True, True, False, False]
+    assert rl.allow("outro")
+    assert rl.throttled == 2
+
+
+def test_sender_rate_limiter_memoria_limitada():
+    rl = SenderRateLimiter(max_senders=64, shards=4)
+    for i in range(10_000):
+        rl.allow(f"user{i}")
+    assert len(rl) <= 64
+
+# -----------------------------------------------------------------------------
+# LoadShedder
+# -----------------------------------------------------------------------------
+
+def test_load_shedder_niveis():
+    ls = LoadShedder(max_inflight=1)
+    with ls.slot() as a:
+        with ls.slot() as b:
+            assert (a, b) == (LOAD_OK, LOAD_SHED_EXPENSIVE)
+            assert ls.inflight == 2
+    assert ls.inflight == 0
+
+
+def test_load_shedder_pela_espera_do_lock():
+    ls = LoadShedder(max_inflight=10, expensive_wait=0.05, max_wait=0.3)
+    lock = threading.Lock()
+    levels = []
+
+    def waiter():
+        with ls.slot(lock) as level:
+            levels.append(level)
+
+    with ls.slot(lock) as first:
+        assert first == LOAD_OK
+        t = threading.Thread(target=waiter)
+        t.start()
+        time.sleep(0.1)            # o outro espera mais que expensive_wait
+    t.join()
+    assert levels == [LOAD_SHED_EXPENSIVE]
+
+    with ls.slot(lock):
+        t = threading.Thread(target=waiter)
+        t.start()
+        t.join()                   # não obtém o lock em max_wait
+    assert levels[-1] == LOAD_SHED_ALL
+    assert ls.shed_all == 1
+    assert lock.acquire(blocking=False)   # o slot sempre devolve o lock
+    lock.release()
+
+# -----------------------------------------------------------------------------
+# ZafiraCore sob sobrecarga
+# -----------------------------------------------------------------------------
+
+class ExplodingMarketplace:
+    def search_products(self, *args, **kwargs):
+        raise AssertionError("busca não deveria acontecer sob sobrecarga")
+
+
+def test_core_descarta_intents_caras_e_mantem_baratas(whatsapp):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.aliexpress = z.mercado = ExplodingMarketplace()
+    z.load = LoadShedder(max_inflight=0)
+
+    z.process_message("u1", "quero um fone bluetooth")
+    assert z.whatsapp.sent[-1] == ("u1", "text", OVERLOAD_REPLY)
+    assert z.load.shed_expensive == 1
+
+    z.process_message("u1", "me conte uma piada")
+    assert z.whatsapp.last_text in z.ag_humor.piadas
+
+
+def test_core_ignora_sender_limitado(whatsapp):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.rate_limiter = SenderRateLimiter(per_minute=1, burst=2)
+    for _ in range(5):
+        z.process_message("u1", "me conte uma piada")
+    assert len(z.whatsapp.sent) == 2
+    assert z.rate_limiter.throttled == 3
+
+
+def test_core_descarta_intents_caras_com_os_padroes_do_gunicorn(whatsapp, monkeypatch):
+    # Com as threads reais do gunicorn.conf.py, o limite tem de ser alcançável
+    for var in ("GUNICORN_THREADS", "MAX_INFLIGHT"):
+        monkeypatch.delenv(var, raising=False)
+    threads = runpy.run_path(str(Path(__file__).resolve().parent.parent / "gunicorn.conf.py"))["threads"]
+
+    release = threading.Event()
+
+    class BlockingMarketplace:
+        def search_products(self, *args, **kwargs):
+            release.wait(5)
+            return []
+
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.aliexpress = z.mercado = BlockingMarketplace()
+    assert z.load.max_inflight < threads
+
+    # Senders em stripes diferentes: aqui só interessa a concorrência entre threads
+    senders = {}
+    for i in range(10_000):
+        senders.setdefault(id(z._sender_locks.lock_for(f"u{i}")), f"u{i}")
+    workers = [threading.Thread(target=z.process_message, args=(sid, "quero um fone"))
+               for sid in list(senders.values())[:threads]]
+    for w in workers:
+        w.start()
+    deadline = time.monotonic() + 5
+    while z.load.shed_expensive < threads - z.load.max_inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for w in workers:
+        w.join()
+
+    assert z.load.shed_expensive == threads - z.load.max_inflight
+    assert sum(1 for _, _, text in whatsapp.sent if text == OVERLOAD_REPLY) == z.load.shed_expensive
+
+
+class SlowMarketplace:
+    """Segura o lock do sender como uma busca lenta."""
+    def __init__(self, delay):
+        self.delay = delay
+
+    def search_products(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return []
+
+
+def _follow_up_durante_busca(z):
+    search = threading.Thread(target=z.process_message, args=("u1", "quero fone"))
+    search.start()
+    time.sleep(0.05)                      # a busca já está com o lock
+    z.process_message("u1", "me conte uma piada")
+    search.join()
+    return [body for to, kind, body in z.whatsapp.sent if to == "u1"]
+
+
+def test_core_espera_pelo_lock_cobre_o_orcamento(monkeypatch):
+    monkeypatch.delenv("MAX_LOCK_WAIT_S", raising=False)
+    z = ZafiraCore()
+    assert z.load.max_wait >= z.message_budget
+
+
+def test_core_follow_up_do_mesmo_sender_durante_busca_lenta(whatsapp, monkeypatch):
+    monkeypatch.delenv("MAX_LOCK_WAIT_S", raising=False)
+    monkeypatch.setenv("MESSAGE_BUDGET_S", "1")
+    monkeypatch.setenv("REPLY_RESERVE_S", "0.2")
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.aliexpress = z.mercado = SlowMarketplace(delay=0.4)
+
+    replies = _follow_up_durante_busca(z)
+    assert len(replies) == 2
+    assert replies[-1] in z.ag_humor.piadas
+    assert z.load.shed_all == 0
+
+
+def test_core_responde_quem_desiste_do_lock(whatsapp, monkeypatch):
+    monkeypatch.setenv("MAX_LOCK_WAIT_S", "0.1")
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    z.aliexpress = z.mercado = SlowMarketplace(delay=0.4)
+
+    replies = _follow_up_durante_busca(z)
+    assert OVERLOAD_REPLY in replies      # nada de descartar em silêncio
+    assert z.load.shed_all == 1
@@ -0,0 +1,133 @@
+# tests/test_response_cache.py
+
+from datetime import datetime, timedelta
+
+from agents.response_cache import ResponseCache, fingerprint
+from agents.agente_conversa_adm_groq import AgenteConversaADMGroq
+from zafira_core import ZafiraCore
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class CountingGroq(AgenteConversaADMGroq):
+    """Substitui a chamada HTTP por uma resposta numerada."""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def _completar(self, history, message, deadline=None, reserve=0.0):
+        self.calls.append((list(history), message))
+        return f"resposta {len(self.calls)}"
+
+# -----------------------------------------------------------------------------
+# ResponseCache
+# -----------------------------------------------------------------------------
+
+def test_fingerprint_normaliza_texto():
+    assert fingerprint("s", [], "Quantos usuários hoje?") == fingerprint("s", [], "quantos  usuarios HOJE")
+    assert fingerprint("s", [], "oi") != fingerprint("outro", [], "oi")
+    assert fingerprint("s", ["a"], "oi") != fingerprint("s", ["b"], "oi")
+
+
+def test_ttl_e_lru():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    cache.put("a", 1, cost=2.0)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" passa a ser o mais recente
+    cache.put("c", 3)                   # expulsa "b"
+    assert cache.get("b") is None
+    clock.t += 11
+    assert cache.get("a") is None       # expirou
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["saved_s"]) == (1, 2, 2.0)
+
+
+def test_popular_lista_frequentes_fora_do_cache():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=100, clock=clock)
+    for _ in range(3):
+        cache.get("freq", request="pedido freq")
+    cache.get("raro", request="pedido raro")
+    assert cache.popular() == [("freq", "pedido freq")]
+    cache.put("freq", "ok")
+    assert cache.popular(refresh_ahead=60) == []
+    clock.t += 50                       # faltam 50s para expirar
+    assert cache.popular(refresh_ahead=60) == [("freq", "pedido freq")]
+
+
+def test_rastreio_limitado():
+    cache = ResponseCache(max_tracked=3)
+    for k in ("a", "a", "b", "c", "d"):
+        cache.get(k, request=k)
+    assert len(cache._requests) == 3
+    assert "a" in cache._requests
+
+# -----------------------------------------------------------------------------
+# Agente ADM
+# -----------------------------------------------------------------------------
+
+def test_agente_sem_contexto_reaproveita_pergunta_repetida():
+    ag = CountingGroq(cache=ResponseCache(), context_turns=0)
+    r1 = ag.responder(["status da campanha?"], "status da campanha?")
+    r2 = ag.responder(["status da campanha?", "outra", "Status da campanha"], "Status da campanha")
+    assert r1 == r2 == "resposta 1"
+    assert len(ag.calls) == 1
+
+
+def test_agente_com_contexto_diferencia_follow_up():
+    ag = CountingGroq(cache=ResponseCache(), context_turns=1)
+    ag.responder(["vendas hoje?", "e ontem?"], "e ontem?")
+    ag.responder(["usuarios hoje?", "e ontem?"], "e ontem?")
+    assert len(ag.calls) == 2
+    # Mesmo contexto imediato: aí sim reaproveita
+    ag.responder(["bom dia", "vendas hoje?", "e ontem?"], "e ontem?")
+    assert len(ag.calls) == 2
+
+
+def test_precompute_recalcula_frequentes():
+    clock = FakeClock()
+    ag = CountingGroq(cache=ResponseCache(ttl=100, clock=clock))
+    ag.responder(["resumo"], "resumo")
+    ag.responder(["resumo"], "resumo")
+    clock.t += 200                      # expirou
+    assert ag.precompute() == 1
+    assert ag.calls[-1] == (["resumo"], "resumo")
+    assert ag.responder(["resumo"], "resumo") == "resposta 2"
+    assert ag.cache.stats()["precomputed"] == 1
+
+# -----------------------------------------------------------------------------
+# ZafiraCore
+# -----------------------------------------------------------------------------
+
+def _core_adm(whatsapp, *admins):
+    z = ZafiraCore()
+    z.whatsapp = whatsapp
+    # Mesmas configurações padrão do agente real, sem a chamada HTTP
+    z.ag_adm_groq = CountingGroq(cache=ResponseCache(), context_turns=z.ag_adm_groq.context_turns)
+    for sid in admins:
+        z.admin_sessions[sid] = datetime.utcnow() + timedelta(minutes=30)
+    return z
+
+
+def test_core_padrao_nao_reaproveita_follow_up(whatsapp):
+    z = _core_adm(whatsapp, "adm")
+    for msg in ["quantas vendas hoje?", "e ontem?", "quantos usuarios hoje?", "e ontem?"]:
+        z.process_message("adm", msg)
+    assert z.whatsapp.last_text == "resposta 4"
+    assert len(z.ag_adm_groq.calls) == 4
+
+
+def test_relatorio_mostra_cache_adm(whatsapp):
+    z = _core_adm(whatsapp, "adm", "adm2")
+    z.process_message("adm", "como está a campanha?")
+    z.process_message("adm2", "Como esta a campanha")
+    assert z.whatsapp.last_text == "resposta 1"
+    z.process_message("adm", "/relatorio")
+    assert "Cache ADM: 1/2 (50%)" in z.whatsapp.last_text
@@ -0,0 +1,50 @@
+# tests/test_startup.py
+
+import threading
+
+import startup
+from clients.whatsapp_client import WhatsAppClient
+from zafira_core import ZafiraCore
+
+
+def test_clientes_criados_no_primeiro_uso():
+    z = ZafiraCore()
+    for name in ("whatsapp", "aliexpress", "mercado", "groc"):
+        assert name not in z.__dict__
+    assert isinstance(z.whatsapp, WhatsAppClient)
+    assert z.whatsapp is z.whatsapp
+    assert "groc" not in z.__dict__
+
+
+def test_cliente_criado_uma_vez_com_varias_threads(monkeypatch):
+    created = []
+
+    class SlowClient:
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr(ZafiraCore.__dict__["mercado"], "factory", SlowClient)
+    z = ZafiraCore()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(z.mercado)) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(c is created[0] for c in seen)
+
+
+def test_atribuicao_substitui_cliente_preguicoso():
+    z = ZafiraCore()
+    dummy = object()
+    z.whatsapp = dummy
+    assert z.whatsapp is dummy
+
+
+def test_startup_mede_tempo_e_memoria():
+    startup.mark("teste_ms")
+    s = startup.stats()
+    assert s["rss_mb"] > 0
+    assert s["teste_ms"] >= 0
+    assert "RSS" in startup.summary()
@@ -0,0 +1,146 @@
+# tests/test_whatsapp_pool.py
+
+import time
+from collections import Counter
+
+import pytest
+
+from app import _extract_message
+from clients.whatsapp_client import WhatsAppClient
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self._data = data if data is not None else {"messages": [{"id": "wamid.1"}]}
+        self.text = str(self._data)
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setenv("WHATSAPP_PHONE_NUMBER_IDS", "111,222,333")
+    monkeypatch.setenv("WHATSAPP_TOKENS", "t1,t2,t3")
+    calls = []
+    responses = {}
+
+    def fake_post(url, headers=None, json=None, timeout=None):
+        number = url.rstrip("/").split("/")[-2]
+        calls.append((number, headers["Authorization"], json["to"]))
+        return responses.get(number, FakeResponse())
+
+    monkeypatch.setattr("clients.whatsapp_client.requests.post", fake_post)
+    client = WhatsAppClient()
+    return client, calls, responses
+
+
+def test_pool_le_numeros_e_tokens(pool):
+    client, _, _ = pool
+    assert [n.phone_number_id for n in client.numbers] == ["111", "222", "333"]
+    assert client.phone_number_id == "111"
+    assert client.token == "t1"
+
+
+def test_token_unico_vale_para_todos(monkeypatch):
+    monkeypatch.setenv("WHATSAPP_PHONE_NUMBER_IDS", "111,222")
+    monkeypatch.delenv("WHATSAPP_TOKENS", raising=False)
+    monkeypatch.setenv("WHATSAPP_TOKEN", "unico")
+    client = WhatsAppClient()
+    assert [n.token for n in client.numbers] == ["unico", "unico"]
+
+
+def test_numero_unico_legado(monkeypatch):
+    monkeypatch.delenv("WHATSAPP_PHONE_NUMBER_IDS", raising=False)
+    monkeypatch.delenv("WHATSAPP_TOKENS", raising=False)
+    monkeypatch.setenv("WHATSAPP_PHONE_NUMBER_ID", "999")
+    monkeypatch.setenv("WHATSAPP_TOKEN", "tok")
+    client = WhatsAppClient()
+    assert len(client.numbers) == 1
+    assert client.phone_number_id == "999"
+
+
+def test_resposta_sai_pelo_numero_fixado(pool):
+    client, calls, _ = pool
+    client.pin("u1", "333")
+    for _ in range(5):
+        assert client.send_text_message("u1", "oi")
+    assert {c[0] for c in calls} == {"333"}
+    assert calls[0][1] == "Bearer t3"
+
+
+def test_proativo_distribui_entre_numeros(pool):
+    client, calls, _ = pool
+    for i in range(30):
+        client.send_text_message(f"u{i}", "promo", proactive=True)
+    per_number = {n: sum(1 for c in calls if c[0] == n) for n in ("111", "222", "333")}
+    assert per_number == {"111": 10, "222": 10, "333": 10}
+
+
+def test_proativo_usa_numero_fixado(pool):
+    client, calls, _ = pool
+    client.pin("u1", "111")
+    client.send_text_message("x", "aquece 111", proactive=True)   # 111 fica mais carregado
+    client.send_text_message("u1", "promo", proactive=True)
+    assert calls[-1][0] == "111"
+
+
+def test_proativo_sai_de_outro_numero_se_o_fixado_esta_pausado(pool):
+    client, calls, responses = pool
+    responses["111"] = FakeResponse(429, {"error": {"code": 130429, "message": "rate"}})
+    client.pin("u1", "111")
+    client.send_text_message("u1", "promo", proactive=True)     # 111 entra em pausa
+    client.send_text_message("u1", "promo", proactive=True)
+    assert calls[0][0] == "111" and calls[-1][0] != "111"
+
+
+def test_numero_com_throttling_sai_do_rodizio(pool):
+    client, calls, responses = pool
+    responses["222"] = FakeResponse(429, {"error": {"code": 130429, "message": "rate"}})
+    for i in range(30):
+        client.send_text_message(f"u{i}", "promo", proactive=True)
+    assert sum(1 for c in calls if c[0] == "222") == 1
+    stats = {s["phone_number_id"]: s for s in client.stats()}
+    assert stats["222"]["cooling"] and stats["222"]["errors"] == 1
+    assert stats["111"]["sent"] + stats["333"]["sent"] == 29
+
+
+def test_proativo_respeita_vazao_por_numero(pool, monkeypatch):
+    _, calls, responses = pool
+    monkeypatch.setenv("BROADCAST_RATE", "20")
+    client = WhatsAppClient()
+    responses["222"] = FakeResponse(429, {"error": {"code": 130429, "message": "rate"}})
+    start = time.monotonic()
+    for i in range(60):
+        client.send_text_message(f"u{i}", "promo", proactive=True)
+    elapsed = time.monotonic() - start
+
+    per_number = Counter(c[0] for c in calls)
+    assert per_number["222"] == 1
+    # Com 222 pausado, 111 e 333 não absorvem a vazão dele: rajada de 20 + 20/s
+    for n in ("111", "333"):
+        assert per_number[n] <= 20 + 20 * elapsed + 1
+    assert elapsed >= 0.4
+
+
+def test_pins_limitados(pool, monkeypatch):
+    monkeypatch.setenv("WHATSAPP_PHONE_NUMBER_IDS", "111,222")
+    monkeypatch.setenv("WHATSAPP_TOKENS", "t1,t2")
+    client = WhatsAppClient(max_pins=2)
+    client.pin("a", "111")
+    client.pin("b", "222")
+    client.pin("c", "111")
+    client.pin("d", "999")   # número desconhecido é ignorado
+    assert list(client._pins) == ["b", "c"]
+
+
+def test_webhook_extrai_numero_de_destino():
+    data = {"entry": [{"changes": [{"value": {
+        "metadata": {"phone_number_id": "222"},
+        "contacts": [{"wa_id": "5511"}],
+        "messages": [{"text": {"body": "oi"}}],
+    }}]}]}
+    msg = _extract_message(data)
+    assert msg["phone_number_id"] == "222"
+    assert msg["body"] == "oi"
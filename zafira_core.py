@@ -3,114 +3,330 @@
 import os
 import re
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from urllib.parse import quote_plus
 
+import startup
 from clients.whatsapp_client import WhatsAppClient
 from clients.aliexpress_client import AliExpressClient
 from clients.mercado_livre_client import MercadoLivreClient
 from clients.groc_client import GROCClient
+from clients.deadline import Deadline, DeadlineExceeded
 
 from agents.agente_conversa_geral import AgenteConversaGeral
 from agents.agente_conhecimento import AgenteConhecimento
 from agents.agente_humor import AgenteHumor
 from agents.agente_conversa_adm_groq import AgenteConversaADMGroq
+from agents.response_cache import ResponseCache
+from agents.message_normalizer import normalize, fold, NormalizedMessage
 from agents.session_manager import SessionManager
+from agents.striped_lock import StripedLock
+from agents.lru_cache import LRUCache
+from agents.analytics import UsageAnalytics
+from agents.broadcast import BroadcastEngine, JobRunning
+from agents.audience import AudienceLog
+from agents.rate_limiter import SenderRateLimiter, LoadShedder, LOAD_SHED_ALL, LOAD_SHED_EXPENSIVE
 
 logger = logging.getLogger(__name__)
 
+# Resposta barata enviada quando uma intent cara é descartada por sobrecarga
+OVERLOAD_REPLY = "⏳ Estou com muita procura agora. Tente de novo em alguns instantes, por favor!"
+
+# Resposta quando o orçamento de tempo da mensagem acaba antes do resultado
+TIMEOUT_REPLY = "⏳ Demorei demais para responder essa. Pode tentar de novo?"
+
+# Palavras-chave de cada intent, em ordem de prioridade, sobre o texto sem
+# acento. Basta a palavra aparecer (`in`); as que precisam terminar em
+# fronteira de palavra ("o que eu" não é pergunta) levam a regex junto.
+INTENT_PATTERNS = [
+    ("saudacao",         ("oi", "ola", ("e ai", re.compile(r"e ai\b")), "tudo bem")),
+    ("modo_admin",       ("modo adm",)),
+    ("relatorio",        ("relatorio", "pesquisa", "planilha")),
+    ("informacao_geral", (("o que e", re.compile(r"o que e\b")), "quem", "onde", "por que")),
+    ("produto",          ("quero", "procuro", "comprar", "busco")),
+    ("links",            ("link", "url")),
+    ("piada",            ("piada", "trocadilho")),
+]
+
+# Mesma tabela como (palavra, regex ou None), para o laço não testar tipos
+_INTENT_KEYWORDS = [
+    (intent, [kw if isinstance(kw, tuple) else (kw, None) for kw in keywords])
+    for intent, keywords in INTENT_PATTERNS
+]
+
+# Ids das linhas das listas: prod_<n> (busca) ou oferta_<job_id>_<n> (broadcast)
+CHOICE_ID_RE = re.compile(r"(?:prod|oferta_([A-Za-z0-9]+))_(\d{1,3})")
+
+BROADCAST_HELP = (
+    "📣 Comandos de broadcast:\n"
+    "- /broadcast <texto>\n"
+    "- /broadcast imagem <url> <legenda>\n"
+    "- /broadcast lista (última busca)\n"
+    "- /broadcast filtro=<termo> ... (só quem já falou <termo>)\n"
+    "- /broadcast status [id] | retomar <id> | cancelar <id>"
+)
+
+
+class _LazyClient:
+    """
+    Atributo criado no primeiro acesso (uma vez por instância, com lock).
+    Com `gunicorn --preload` o ZafiraCore nasce no master, mas os clientes de
+    rede (e suas conexões) só são criados depois do fork, em cada worker.
+    Atribuir direto (z.whatsapp = Dummy()) continua funcionando.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock    = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with self.lock:
+            value = instance.__dict__.get(self.name)
+            if value is None:
+                value = instance.__dict__[self.name] = self.factory()
+        return value
+
 
 class ZafiraCore:
-    def __init__(self):
-        self.whatsapp    = WhatsAppClient()
-        self.aliexpress  = AliExpressClient()
-        self.mercado     = MercadoLivreClient()
-        self.groc        = GROCClient()
+    whatsapp   = _LazyClient(WhatsAppClient)
+    aliexpress = _LazyClient(AliExpressClient)
+    mercado    = _LazyClient(MercadoLivreClient)
+    groc       = _LazyClient(GROCClient)
 
+    def __init__(self):
         self.ag_conv     = AgenteConversaGeral()
         self.ag_conh     = AgenteConhecimento()
         self.ag_humor    = AgenteHumor()
-        self.ag_adm_groq = AgenteConversaADMGroq()
+        self.ag_adm_groq = AgenteConversaADMGroq(
+            cache=self._adm_cache(),
+            context_turns=int(os.getenv("ADM_CACHE_CONTEXT_TURNS", "1")),
+        )
 
         self.sessions       = SessionManager(max_len=50)
         self.admin_ids      = os.getenv("ADMIN_IDS", "").split(",")
         self.admin_pin      = os.getenv("ADMIN_PIN", "").strip()
         self.admin_sessions = {}
 
-        self._last_products = []
-        self._last_query    = ""
+        # Última busca de cada usuário: { sender_id: (termos, [produtos]) }, LRU
+        self._last_search = LRUCache(int(os.getenv("LAST_SEARCH_MAX", "10000")))
+
+        # Serializa mensagens do mesmo sender; senders diferentes rodam em paralelo
+        self._sender_locks = StripedLock(int(os.getenv("SENDER_LOCK_STRIPES", "256")))
+
+        # Limite por sender e descarte de carga global
+        self.rate_limiter = SenderRateLimiter(
+            per_minute=float(os.getenv("RATE_LIMIT_PER_MIN", "20")),
+            burst=float(os.getenv("RATE_LIMIT_BURST", "10")),
+            max_senders=int(os.getenv("RATE_LIMIT_MAX_SENDERS", "100000")),
+        )
+        # Orçamento de tempo por mensagem; `reply_reserve` fica guardado para a resposta
+        self.message_budget = float(os.getenv("MESSAGE_BUDGET_S", "25"))
+        self.reply_reserve  = float(os.getenv("REPLY_RESERVE_S", "3"))
+
+        # Um worker gthread roda no máximo GUNICORN_THREADS mensagens ao mesmo
+        # tempo: o limite de intents caras tem de ficar abaixo disso. O lock do
+        # sender pode ficar preso por um orçamento inteiro (busca lenta), então
+        # a espera por ele tem de cobrir esse tempo para não perder o follow-up
+        threads = int(os.getenv("GUNICORN_THREADS", "16"))
+        self.load = LoadShedder(
+            max_inflight=int(os.getenv("MAX_INFLIGHT", str(max(1, threads * 3 // 4)))),
+            expensive_wait=float(os.getenv("SHED_EXPENSIVE_WAIT_S", "1")),
+            max_wait=float(os.getenv("MAX_LOCK_WAIT_S", str(self.message_budget + self.reply_reserve))),
+        )
+        if self.load.max_inflight >= threads:
+            logger.warning(f"MAX_INFLIGHT={self.load.max_inflight} >= GUNICORN_THREADS={threads}: "
+                           "intents caras nunca serão descartadas")
+
+        # Quem já falou com a Zafira, em disco e visível a todos os workers (broadcast)
+        self.audience = AudienceLog(
+            data_dir=os.path.join(os.getenv("ZAFIRA_DATA_DIR", "data"), "audience"),
+            keep_days=int(os.getenv("AUDIENCE_KEEP_DAYS", "30")),
+        )
+
+        # Métricas de uso (memória constante), lidas pelo relatório ADM
+        self.analytics = UsageAnalytics(
+            data_dir=os.path.join(os.getenv("ZAFIRA_DATA_DIR", "data"), "analytics"),
+            flush_interval=float(os.getenv("ANALYTICS_FLUSH_S", "60")),
+        )
+
+        # Pré-cálculo das perguntas ADM frequentes, iniciado no primeiro uso do ADM
+        self._precompute_thread = None
+        self._precompute_lock   = threading.Lock()
+
+        # Envio em massa (modo ADM), criado no primeiro uso
+        self._broadcast      = None
+        self._broadcast_lock = threading.Lock()
 
         logger.info("ZafiraCore iniciada com suportes a AliExpress + MercadoLivre.")
 
-    def process_message(self, sender_id: str, message: str, interactive: dict = None):
+    @staticmethod
+    def _adm_cache():
+        size = int(os.getenv("ADM_CACHE_SIZE", "512"))
+        if size <= 0:
+            return None
+        return ResponseCache(max_entries=size, ttl=float(os.getenv("ADM_CACHE_TTL_S", "600")))
+
+    def _ensure_precompute(self):
+        """Com ADM_PRECOMPUTE=1, sobe (uma vez) a thread que usa o tempo ocioso."""
+        if self._precompute_thread is not None or os.getenv("ADM_PRECOMPUTE", "0") != "1":
+            return
+        with self._precompute_lock:
+            if self._precompute_thread is None:
+                self._precompute_thread = threading.Thread(
+                    target=self._precompute_loop, name="adm-precompute", daemon=True
+                )
+                self._precompute_thread.start()
+
+    def _precompute_loop(self):
+        interval = float(os.getenv("ADM_PRECOMPUTE_INTERVAL_S", "60"))
+        while True:
+            time.sleep(interval)
+            # Só gasta chamadas à Groq quando nenhuma mensagem está em andamento
+            if self.load.inflight:
+                continue
+            try:
+                self.ag_adm_groq.precompute(deadline=Deadline(self.message_budget))
+            except Exception as e:
+                logger.error(f"[ADM CACHE] erro no precompute: {e}")
+
+    @property
+    def broadcast(self) -> BroadcastEngine:
+        if self._broadcast is None:
+            with self._broadcast_lock:
+                if self._broadcast is None:
+                    self._broadcast = BroadcastEngine(
+                        self.whatsapp,
+                        data_dir=os.path.join(os.getenv("ZAFIRA_DATA_DIR", "data"), "broadcasts"),
+                        # BROADCAST_RATE vale por número e é imposto pelo cliente;
+                        # BROADCAST_MAX_RATE é um teto opcional para o job todo
+                        rate_per_sec=float(os.getenv("BROADCAST_MAX_RATE", "0")) or None,
+                        workers=int(os.getenv("BROADCAST_WORKERS", "16")),
+                        max_retries=int(os.getenv("BROADCAST_MAX_RETRIES", "3")),
+                        on_sent=self._on_broadcast_sent,
+                    )
+        return self._broadcast
+
+    def _on_broadcast_sent(self, job, recipient: str):
+        # Cada oferta em lista entregue é uma impressão (base dos cliques oferta_)
+        if job.kind == "list":
+            self.analytics.record_impression(broadcast=True)
+
+    def process_message(self, sender_id: str, message: str, interactive: dict = None,
+                        phone_number_id: str = None):
+        if phone_number_id:
+            # Responde pelo mesmo número em que o usuário escreveu
+            self.whatsapp.pin(sender_id, phone_number_id)
+        if not self.rate_limiter.allow(sender_id):
+            logger.debug(f"[THROTTLE] {sender_id} excedeu o limite de mensagens")
+            return None
+
+        # O slot também adquire o lock do sender, medindo a espera por ele
+        with self.load.slot(self._sender_locks.lock_for(sender_id)) as level:
+            if level == LOAD_SHED_ALL:
+                logger.warning(f"[SHED] {sender_id} esperou mais de {self.load.max_wait}s pelo lock")
+                # O webhook já respondeu 200: sem esta resposta a mensagem some
+                return self.whatsapp.send_text_message(
+                    sender_id, OVERLOAD_REPLY, deadline=Deadline(self.reply_reserve))
+            # O orçamento conta a partir do lock: a espera não come o tempo da resposta
+            deadline = Deadline(self.message_budget)
+            try:
+                return self._process_message(
+                    sender_id, message, interactive,
+                    overloaded=(level == LOAD_SHED_EXPENSIVE),
+                    deadline=deadline,
+                )
+            except DeadlineExceeded as e:
+                logger.warning(f"[DEADLINE] {sender_id}: {e}; resposta descartada")
+                return None
+
+    def _process_message(self, sender_id: str, message: str, interactive: dict = None,
+                         overloaded: bool = False, deadline: Deadline = None):
         now = datetime.utcnow()
         self.sessions.push(sender_id, message)
 
         # 1) Se veio seleção interativa
         if interactive and interactive.get("type") == "list_reply":
             choice_id = interactive["list_reply"]["id"]
-            return self._handle_product_selection(sender_id, choice_id)
+            self.analytics.record_message(sender_id, "selecao")
+            return self._handle_product_selection(sender_id, choice_id, deadline=deadline)
 
         # 2) PIN pendente
         if self.admin_sessions.get(sender_id) == "aguardando_pin":
-            return self._handle_admin_pin(sender_id, message)
+            self.analytics.record_message(sender_id, "admin_pin")
+            return self._handle_admin_pin(sender_id, message, deadline=deadline)
 
         # 3) Chat livre ADM
         exp = self.admin_sessions.get(sender_id)
         if isinstance(exp, datetime) and now <= exp:
             self.admin_sessions[sender_id] = now + timedelta(minutes=30)
+            self.analytics.record_message(sender_id, "adm")
+            command = message.strip().lower()
+            if command.startswith("/broadcast"):
+                return self._handle_broadcast(sender_id, message, deadline=deadline)
+            if command.startswith("/relatorio"):
+                return self._handle_relatorio(sender_id, message, deadline=deadline)
+            if overloaded:
+                return self._handle_overload(sender_id, deadline=deadline)
+            self._ensure_precompute()
             history = self.sessions.get(sender_id)
-            reply   = self.ag_adm_groq.responder(history, message)
-            return self.whatsapp.send_text_message(sender_id, reply)
-
-        # 4) Detecta intenção
-        intent = self._detect_intent(message)
+            try:
+                reply = self.ag_adm_groq.responder(
+                    history, message, deadline=deadline, reserve=self.reply_reserve
+                )
+            except DeadlineExceeded as e:
+                logger.warning(f"[DEADLINE] ADM {sender_id}: {e}")
+                reply = TIMEOUT_REPLY
+            return self.whatsapp.send_text_message(sender_id, reply, deadline=deadline)
+
+        # 4) Normaliza uma vez e detecta intenção
+        msg    = normalize(message)
+        self.audience.record(sender_id, msg)
+        intent = self._detect_intent(msg)
+        self.analytics.record_message(sender_id, intent)
         logger.info(f"[INTENT] {sender_id} → '{message}' => {intent}")
 
         # 5) Roteamento de intents
         if intent == "saudacao":
-            return self._handle_saudacao(sender_id)
+            return self._handle_saudacao(sender_id, deadline=deadline)
         if intent == "modo_admin":
-            return self._handle_modo_admin(sender_id)
+            return self._handle_modo_admin(sender_id, deadline=deadline)
         if intent == "relatorio":
-            return self._handle_relatorio(sender_id, message)
+            return self._handle_relatorio(sender_id, message, deadline=deadline)
         if intent == "conversa_geral":
-            resp = self.ag_conv.responder(message)
+            resp = self.ag_conv.responder(msg)
             if resp:
-                return self.whatsapp.send_text_message(sender_id, resp)
+                return self.whatsapp.send_text_message(sender_id, resp, deadline=deadline)
         if intent == "informacao_geral":
-            resp = self.ag_conh.responder(message)
+            resp = self.ag_conh.responder(msg)
             if resp:
-                return self.whatsapp.send_text_message(sender_id, resp)
+                return self.whatsapp.send_text_message(sender_id, resp, deadline=deadline)
         if intent == "produto":
-            return self._handle_produto(sender_id, message)
+            if overloaded:
+                return self._handle_overload(sender_id, deadline=deadline)
+            return self._handle_produto(sender_id, msg, deadline=deadline)
         if intent == "links":
-            return self._handle_links(sender_id)
+            return self._handle_links(sender_id, deadline=deadline)
         if intent == "piada":
-            joke = self.ag_humor.responder(message)
-            return self.whatsapp.send_text_message(sender_id, joke)
-
-        return self._handle_fallback(sender_id)
-
-    def _detect_intent(self, msg: str) -> str:
-        m = msg.lower()
-        if any(g in m for g in ["oi", "olá", "ola", "oiee", "e aí", "tudo bem"]):
-            return "saudacao"
-        if "modo adm" in m:
-            return "modo_admin"
-        if any(r in m for r in ["relatorio", "pesquisa", "planilha"]):
-            return "relatorio"
-        if any(i in m for i in ["o que é", "quem", "onde", "por que"]):
-            return "informacao_geral"
-        if any(b in m for b in ["quero", "procuro", "comprar", "busco"]):
-            return "produto"
-        if any(k in m for k in ["link", "links", "url"]):
-            return "links"
-        if any(p in m for p in ["piada", "trocadilho"]):
-            return "piada"
+            joke = self.ag_humor.responder(msg)
+            return self.whatsapp.send_text_message(sender_id, joke, deadline=deadline)
+
+        return self._handle_fallback(sender_id, deadline=deadline)
+
+    def _detect_intent(self, msg) -> str:
+        m = normalize(msg).folded
+        for intent, keywords in _INTENT_KEYWORDS:
+            for word, boundary in keywords:
+                if word in m and (boundary is None or boundary.search(m)):
+                    return intent
         return "conversa_geral"
 
-    def _handle_saudacao(self, sid: str):
+    def _handle_saudacao(self, sid: str, deadline: Deadline = None):
         if sid in self.admin_ids:
             text = "E aí chefe, tudo bem? O que manda hoje?"
         else:
@@ -119,27 +335,61 @@ class ZafiraCore:
                 "Posso ajudar a encontrar os melhores produtos.\n"
                 "Por onde começamos hoje?"
             )
-        return self.whatsapp.send_text_message(sid, text)
+        return self.whatsapp.send_text_message(sid, text, deadline=deadline)
 
-    def _handle_modo_admin(self, sid: str):
+    def _handle_modo_admin(self, sid: str, deadline: Deadline = None):
         if sid not in self.admin_ids:
-            return self.whatsapp.send_text_message(sid, "❌ Sem permissão ao modo ADM.")
+            return self.whatsapp.send_text_message(sid, "❌ Sem permissão ao modo ADM.", deadline=deadline)
         self.admin_sessions[sid] = "aguardando_pin"
-        return self.whatsapp.send_text_message(sid, "🔐 Modo ADM ativado. Envie seu PIN:")
+        return self.whatsapp.send_text_message(sid, "🔐 Modo ADM ativado. Envie seu PIN:", deadline=deadline)
 
-    def _handle_admin_pin(self, sid: str, msg: str):
+    def _handle_admin_pin(self, sid: str, msg: str, deadline: Deadline = None):
         if msg.strip() == self.admin_pin:
             self.admin_sessions[sid] = datetime.utcnow() + timedelta(minutes=30)
-            return self.whatsapp.send_text_message(sid, "✅ PIN correto! Acesso ADM por 30 min.")
+            return self.whatsapp.send_text_message(sid, "✅ PIN correto! Acesso ADM por 30 min.", deadline=deadline)
         self.admin_sessions[sid] = "aguardando_pin"
-        return self.whatsapp.send_text_message(sid, "❌ PIN incorreto. Tente novamente:")
+        return self.whatsapp.send_text_message(sid, "❌ PIN incorreto. Tente novamente:", deadline=deadline)
 
-    def _handle_relatorio(self, sid: str, msg: str):
+    def _handle_relatorio(self, sid: str, msg: str, deadline: Deadline = None):
         exp = self.admin_sessions.get(sid)
         if not (isinstance(exp, datetime) and datetime.utcnow() <= exp):
-            return self.whatsapp.send_text_message(sid, "❌ Autentique-se no modo ADM.")
-        total = len(self.sessions.sessions)
-        return self.whatsapp.send_text_message(sid, f"👥 Usuários hoje: {total}")
+            return self.whatsapp.send_text_message(sid, "❌ Autentique-se no modo ADM.", deadline=deadline)
+        r    = self.analytics.report()
+        now  = datetime.utcnow()
+        day  = now.strftime("%Y-%m-%d")
+        hour = now.strftime("%Y-%m-%dT%H")
+
+        intents = sorted(r["intents"].get(day, {}).items(), key=lambda x: -x[1])
+        top     = ", ".join(f"{t} ({n})" for t, n in r["top_searches"][:5]) or "-"
+        clicks  = sum(r["clicks"])
+        ctr     = f"{clicks / r['impressions']:.0%}" if r["impressions"] else "-"
+        bc_ctr  = (f"{r['broadcast_clicks'] / r['broadcast_impressions']:.0%}"
+                   if r["broadcast_impressions"] else "-")
+
+        lines = [
+            f"👥 Usuários hoje: ~{r['unique_by_day'].get(day, 0)}",
+            f"⏱️ Usuários nesta hora: ~{r['unique_by_hour'].get(hour, 0)}",
+            "💬 Intents hoje: " + (", ".join(f"{i} {n}" for i, n in intents) or "-"),
+            f"🔎 Top buscas: {top}",
+            f"🖱️ Cliques nas listas: {clicks}/{r['impressions']} ({ctr})",
+            f"📣 Cliques nas ofertas: {r['broadcast_clicks']}/{r['broadcast_impressions']} ({bc_ctr})",
+            f"🚦 Limitados por excesso: {self.rate_limiter.throttled}",
+            f"🧯 Descartados (caros/todos): {self.load.shed_expensive}/{self.load.shed_all}",
+        ]
+        cache = self.ag_adm_groq.cache
+        if cache is not None:
+            c = cache.stats()
+            lines.append(
+                f"🧠 Cache ADM: {c['hits']}/{c['hits'] + c['misses']} ({c['hit_rate']:.0%}) | "
+                f"~{c['saved_s']}s de LLM economizados | {c['precomputed']} pré-calculadas"
+            )
+        lines += self._numbers_lines()
+        lines.append(f"🚀 Worker {startup.summary()}")
+        return self.whatsapp.send_text_message(sid, "\n".join(lines), deadline=deadline)
+
+    def _handle_overload(self, sid: str, deadline: Deadline = None):
+        self.load.record_shed_expensive()
+        return self.whatsapp.send_text_message(sid, OVERLOAD_REPLY, deadline=deadline)
 
     def _fix_image_url(self, url: str) -> str:
         if url.lower().endswith(".webp"):
@@ -147,66 +397,100 @@ class ZafiraCore:
             return f"https://images.weserv.nl/?url={path}&output=jpeg"
         return url
 
-    def _handle_produto(self, sid: str, message: str):
-        clean = re.sub(r"[^\w\s]", "", message.lower())
-        stop  = {"quero", "procuro", "comprar", "busco", "até", "reais"}
-        termos = " ".join(w for w in clean.split() if w not in stop)
-
-        min_p = max_p = None
-        m = re.search(r"(\d+(?:[.,]\d+)?)\s*(?:até|-)\s*(\d+(?:[.,]\d+)?)", message)
-        if m:
-            min_p = float(m.group(1).replace(",", "."))
-            max_p = float(m.group(2).replace(",", "."))
-        else:
-            m2 = re.search(r"até\s*(\d+(?:[.,]\d+)?)", message)
-            if m2:
-                max_p = float(m2.group(1).replace(",", "."))
+    def _handle_produto(self, sid: str, msg: NormalizedMessage, deadline: Deadline = None):
+        termos = " ".join(msg.terms)
+        min_p, max_p = msg.price_range
+
+        # Cada busca usa o que resta do orçamento, guardando tempo para a resposta.
+        # Se o tempo acabar, segue com o que já chegou (resultado parcial).
+        found = []
+        searches = (
+            lambda: self._ali_products(self.aliexpress.search_products(
+                termos, limit=10, page_no=1, deadline=deadline, reserve=self.reply_reserve)),
+            lambda: self.mercado.search_products(
+                termos, limit=10, deadline=deadline, reserve=self.reply_reserve),
+        )
+        timed_out = False
+        for search in searches:
+            try:
+                found += search()
+            except DeadlineExceeded as e:
+                logger.warning(f"[DEADLINE] busca '{termos}' interrompida: {e}")
+                timed_out = True
+                break
+        combined = self._filter_and_sort(found, min_p, max_p)
 
-        ali = self.aliexpress.search_products(termos, limit=10, page_no=1)
-        ml  = self.mercado.search_products(termos, limit=10)
-        combined = ali + ml
+        top3 = combined[:3]
+        self._last_search.put(sid, (termos, top3))
+        self.analytics.record_search(termos)
 
+        if not top3:
+            if timed_out:
+                return self.whatsapp.send_text_message(sid, TIMEOUT_REPLY, deadline=deadline)
+            return self.whatsapp.send_text_message(sid, f"⚠️ Não encontrei '{termos}'.", deadline=deadline)
+
+        self.analytics.record_impression()
+        return self.whatsapp.send_list_message(sid, **self._product_list(termos, top3), deadline=deadline)
+
+    @staticmethod
+    def _ali_products(resp) -> list:
+        """Extrai a lista de produtos da resposta da API de afiliados do AliExpress."""
+        if isinstance(resp, list):
+            return resp
+        try:
+            products = (resp["aliexpress_affiliate_product_query_response"]["resp_result"]
+                        ["result"]["products"]["product"])
+        except (KeyError, TypeError):
+            return []
+        return [dict(p, source=p.get("source", "AliExpress")) for p in products]
+
+    @staticmethod
+    def _filter_and_sort(products: list, min_p: float = None, max_p: float = None) -> list:
+        """Filtra pela faixa de preço e ordena do mais barato ao mais caro."""
         def price_val(p):
             return float(p.get("target_sale_price", "0").replace(",", "."))
         if min_p is not None:
-            combined = [p for p in combined if price_val(p) >= min_p]
+            products = [p for p in products if price_val(p) >= min_p]
         if max_p is not None:
-            combined = [p for p in combined if price_val(p) <= max_p]
-
-        combined.sort(key=price_val)
-        top3 = combined[:3]
-        self._last_products = top3
-        self._last_query    = termos
-
-        if not top3:
-            return self.whatsapp.send_text_message(sid, f"⚠️ Não encontrei '{termos}'.")
+            products = [p for p in products if price_val(p) <= max_p]
+        return sorted(products, key=price_val)
 
+    def _product_list(self, termos: str, products: list, id_prefix: str = "prod") -> dict:
+        """Monta os argumentos de send_list_message para uma lista de produtos."""
         rows = []
-        for idx, p in enumerate(top3, start=1):
+        for idx, p in enumerate(products, start=1):
             source    = p.get("source", "AliExpress")
             raw_title = f"{p['product_title']} — R${p['target_sale_price']} ({source})"
             title     = raw_title if len(raw_title) <= 24 else raw_title[:21] + "..."
             rows.append({
-                "id": f"prod_{idx}",
+                "id": f"{id_prefix}_{idx}",
                 "title": title,
                 "description": ""
             })
-        sections = [{"title": termos[:24], "rows": rows}]
-
-        return self.whatsapp.send_list_message(
-            sid,
-            header=f"Resultados p/ '{termos[:24]}'",
-            body="Toque no item p/ ver detalhes.",
-            footer="Zafira – assistente de compras",
-            button="Ver opções",
-            sections=sections
-        )
-
-    def _handle_product_selection(self, sid: str, choice_id: str):
-        idx = int(choice_id.split("_")[1]) - 1
-        if idx < 0 or idx >= len(self._last_products):
-            return self.whatsapp.send_text_message(sid, "Opção inválida.")
-        p = self._last_products[idx]
+        return {
+            "header":   f"Resultados p/ '{termos[:24]}'",
+            "body":     "Toque no item p/ ver detalhes.",
+            "footer":   "Zafira – assistente de compras",
+            "button":   "Ver opções",
+            "sections": [{"title": termos[:24], "rows": rows}],
+        }
+
+    def _handle_product_selection(self, sid: str, choice_id: str, deadline: Deadline = None):
+        # O id vem do cliente: qualquer coisa fora do formato é opção inválida
+        m = CHOICE_ID_RE.fullmatch(choice_id)
+        if m is None:
+            return self.whatsapp.send_text_message(sid, "Opção inválida.", deadline=deadline)
+        job_id, n = m.groups()
+        idx = int(n) - 1
+        if job_id:
+            # Item de uma oferta enviada por broadcast
+            products = self.broadcast.extra(job_id).get("products", [])
+        else:
+            products = self._last_search.get(sid, ("", []))[1]
+        if idx < 0 or idx >= len(products):
+            return self.whatsapp.send_text_message(sid, "Opção inválida.", deadline=deadline)
+        p = products[idx]
+        self.analytics.record_click(idx + 1, broadcast=bool(job_id))
 
         title = p.get("product_title", "Produto")
         price = p.get("target_sale_price", "-")
@@ -214,23 +498,111 @@ class ZafiraCore:
         img   = p.get("product_main_image_url") or p.get("image_url") or ""
         img   = self._fix_image_url(img)
         caption = f"{title}\nR${price}\n{link}"
-        self.whatsapp.send_media_message(sid, img, caption)
+        self.whatsapp.send_media_message(sid, img, caption, deadline=deadline)
         return None
 
-    def _handle_links(self, sid: str):
-        if not self._last_products:
-            return self.whatsapp.send_text_message(sid, "Nenhuma busca recente.")
-        lines = [f"Links para '{self._last_query}'"]
-        for p in self._last_products:
+    def _handle_broadcast(self, sid: str, msg: str, deadline: Deadline = None):
+        """Comandos ADM de envio em massa (ver BROADCAST_HELP)."""
+        return self.whatsapp.send_text_message(sid, self._broadcast_command(sid, msg), deadline=deadline)
+
+    def _broadcast_command(self, sid: str, msg: str) -> str:
+        """Executa um comando /broadcast e devolve o texto de resposta ao ADM."""
+        rest = msg.strip()[len("/broadcast"):].strip()
+        sub, _, arg = rest.partition(" ")
+        cmd = sub.lower()
+
+        if cmd == "status":
+            try:
+                return self._broadcast_status_text(arg.strip() or None)
+            except ValueError:
+                return f"❌ Job '{arg.strip()}' não encontrado."
+        if cmd == "retomar":
+            try:
+                job = self.broadcast.resume(arg.strip())
+            except JobRunning:
+                return f"⚠️ Job {arg.strip()} já está rodando."
+            except (OSError, ValueError):
+                return f"❌ Job '{arg.strip()}' não encontrado."
+            return f"▶️ Job {job.job_id} retomado: {job.total - job.skipped} pendentes."
+        if cmd == "cancelar":
+            try:
+                ok = self.broadcast.cancel(arg.strip())
+            except ValueError:
+                ok = False
+            return "⏹️ Job cancelado." if ok else "❌ Job não está rodando."
+
+        termo = None
+        if cmd.startswith("filtro="):
+            # Mesmo fold dos termos gravados na audiência
+            termo = fold(sub[len("filtro="):].lower())
+            rest = arg.strip()
+            sub, _, arg = rest.partition(" ")
+            cmd = sub.lower()
+
+        job_id = self.broadcast.new_job_id()
+        extra  = {}
+        if cmd == "imagem":
+            url, _, caption = arg.strip().partition(" ")
+            if not url:
+                return "❌ Use: /broadcast imagem <url> <legenda>"
+            kind, payload = "image", {"url": self._fix_image_url(url), "caption": caption.strip()}
+        elif cmd == "lista":
+            termos, products = self._last_search.get(sid, ("", []))
+            if not products:
+                return "❌ Faça uma busca antes de enviar a lista."
+            kind    = "list"
+            payload = self._product_list(termos, products, id_prefix=f"oferta_{job_id}")
+            extra   = {"products": products}
+        elif rest:
+            kind, payload = "text", {"body": rest}
+        else:
+            return BROADCAST_HELP
+
+        # Destinatários de todos os workers, não só os deste processo
+        recipients = [r for r in self.audience.senders(termo) if r != sid]
+        if not recipients:
+            return "⚠️ Nenhum destinatário para esse envio."
+
+        job = self.broadcast.start(recipients, kind, payload, job_id=job_id, extra=extra)
+        return f"📣 Broadcast {job.job_id} iniciado para {job.total} usuários."
+
+    def _broadcast_status_text(self, job_id: str = None) -> str:
+        p = self.broadcast.status(job_id)
+        if p is None:
+            return "Nenhum broadcast encontrado."
+        eta = f"{p['eta_s'] / 60:.1f} min" if p["eta_s"] is not None else "-"
+        state = "em andamento" if p["running"] else ("cancelado" if p["cancelled"] else "finalizado")
+        return (
+            f"📣 Broadcast {p['job_id']} ({state})\n"
+            f"Enviados: {p['sent']}/{p['total']} | Falhas: {p['failed']} | Já feitos: {p['skipped']}\n"
+            f"Vazão: {p['rate_per_s']} msg/s | ETA: {eta}\n"
+            + "\n".join(self._numbers_lines())
+        )
+
+    def _numbers_lines(self) -> list[str]:
+        """Vazão e erros de cada número do pool do WhatsApp (deste worker)."""
+        return [
+            f"📱 {n['phone_number_id']}: {n['rate_per_s']} msg/s | "
+            f"enviados {n['sent']} | erros {n['errors']}" + (" | ⏸️ pausado" if n["cooling"] else "")
+            for n in self.whatsapp.stats()
+        ]
+
+    def _handle_links(self, sid: str, deadline: Deadline = None):
+        termos, products = self._last_search.get(sid, ("", []))
+        if not products:
+            return self.whatsapp.send_text_message(sid, "Nenhuma busca recente.", deadline=deadline)
+        lines = [f"Links para '{termos}'"]
+        for p in products:
             lines.append(p.get("promotion_link") or p.get("product_detail_url", "-"))
-        return self.whatsapp.send_text_message(sid, "\n".join(lines))
+        return self.whatsapp.send_text_message(sid, "\n".join(lines), deadline=deadline)
 
-    def _handle_fallback(self, sid: str):
+    def _handle_fallback(self, sid: str, deadline: Deadline = None):
         return self.whatsapp.send_text_message(
             sid,
             "Desculpe, não entendi. 🤔\n"
             "Tente:\n"
             "- 'Quero um fone bluetooth'\n"
             "- 'Links dos produtos'\n"
-            "- 'Me conte uma piada'"
+            "- 'Me conte uma piada'",
+            deadline=deadline
         )